@@ -54,6 +54,7 @@
         'views/admission_views.xml',
         'views/prescription_views.xml',
         'views/bill_views.xml',
+        'views/bank_statement_import_views.xml',
         'views/insurance_views.xml',
         'views/insurance_provider_views.xml',
         'views/specialization_views.xml',
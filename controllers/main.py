@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import fields, http
+from odoo.http import content_disposition, request
+from odoo.tools import consteq
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class HospitalController(http.Controller):
+
+    @http.route('/hospital/analytics/export/<int:analytics_id>', type='http', auth='user')
+    def export_analytics_report(self, analytics_id, **kwargs):
+        """Stream a row-level analytics export, spooled through a temporary file"""
+        wizard = request.env['hospital.analytics'].browse(analytics_id).exists()
+        if not wizard:
+            return request.not_found()
+        tmp = tempfile.TemporaryFile()
+        wizard._write_export(tmp)
+        tmp.seek(0)
+        return request.make_response(
+            wrap_file(request.httprequest.environ, tmp),
+            headers=[
+                ('Content-Type', EXPORT_MIMETYPES[wizard.export_format]),
+                ('Content-Disposition', content_disposition(wizard._get_export_filename())),
+            ],
+        )
+
+    @http.route('/hospital/doctors/free_slots', type='json', auth='user')
+    def doctor_free_slots(self, date_from, date_to, slot_length=0.5, doctor_ids=None, department_id=None,
+                          specialization_id=None, **kwargs):
+        """Free appointment slots of one or many doctors over a date range"""
+        return request.env['hospital.doctor'].get_free_slots(
+            date_from, date_to, slot_length=slot_length, doctor_ids=doctor_ids,
+            department_id=department_id, specialization_id=specialization_id,
+            work_start=kwargs.get('work_start', 8.0), work_end=kwargs.get('work_end', 18.0),
+            include_weekends=kwargs.get('include_weekends', False),
+        )
+
+    @http.route('/hospital/calendar/<int:doctor_id>/<string:token>/appointments.ics', type='http', auth='public')
+    def doctor_calendar_feed(self, doctor_id, token, since=None, **kwargs):
+        """iCalendar feed of a doctor's appointments.
+
+        Answers 304 when the client's ETag is still current; with since
+        (UTC, 'YYYY-MM-DD HH:MM:SS'), only appointments modified after it are sent.
+        """
+        doctor = request.env['hospital.doctor'].sudo().browse(doctor_id).exists()
+        if not doctor or not doctor.calendar_token or not consteq(doctor.calendar_token, token):
+            return request.not_found()
+        if since:
+            try:
+                since = fields.Datetime.to_datetime(since)
+            except ValueError:
+                return request.make_response('Invalid since parameter', status=400)
+
+        etag = doctor._get_calendar_feed_etag(since)
+        headers = [('ETag', '"%s"' % etag), ('Cache-Control', 'private, no-cache')]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_response(
+            doctor._render_calendar_feed(since),
+            headers=headers + [('Content-Type', 'text/calendar; charset=utf-8')],
+        )
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import kpi_cache
 from . import patient
 from . import doctor
 from . import appointment
@@ -10,10 +11,15 @@ from . import bed
 from . import admission
 from . import prescription
 from . import bill
+from . import bill_aging
+from . import bank_statement_import
 from . import insurance
 from . import insurance_provider
 from . import specialization
 from . import prescription_config
 from . import dashboard
+from . import kpi_snapshot
 from . import notification
+from . import mail_mail
 from . import analytics
+from . import report_job
@@ -1,18 +1,34 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from datetime import datetime, time, timedelta
+import math
+
+TIMELINE_STEPS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+# SQL expression of each timeline grouping: (key, label)
+TIMELINE_GROUPS = {
+    None: ("NULL", "NULL"),
+    'room': ("room.id", "room.name"),
+    'room_type': ("room.room_type", "room.room_type"),
+    'department': ("dept.id", "dept.name"),
+}
 
 class HospitalAdmission(models.Model):
     _name = "hospital.admission"
     _description = "Patient Admission"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hospital.kpi.cache.mixin']
     _rec_name = "reference"
     _order = "date_admission desc"
 
     reference = fields.Char(string='Reference', required=True, copy=False, readonly=True, default=lambda self: _('New'))
     patient_id = fields.Many2one('hospital.patient', string="Patient", required=True, tracking=True)
     doctor_id = fields.Many2one('hospital.doctor', string="Doctor", tracking=True)
-    date_admission = fields.Datetime(string='Admission Date', default=fields.Datetime.now, required=True, tracking=True)
+    date_admission = fields.Datetime(string='Admission Date', default=fields.Datetime.now, required=True, index=True, tracking=True)
     discharge_date = fields.Datetime(string='Discharge Date', tracking=True)
+    stay_duration = fields.Float(string='Length of Stay (days)', compute='_compute_stay_duration', store=True, index=True, group_operator='avg')
     bed_id = fields.Many2one('hospital.bed', string="Bed", domain="[('state', '=', 'free')]", tracking=True)
     admission_type = fields.Selection([
         ('emergency', 'Emergency'),
@@ -32,92 +48,244 @@ class HospitalAdmission(models.Model):
     def _expand_states(self, states, domain, order):
         return [key for key, val in type(self).state.selection]
 
+    @api.depends('date_admission', 'discharge_date')
+    def _compute_stay_duration(self):
+        for rec in self:
+            if rec.date_admission and rec.discharge_date:
+                rec.stay_duration = (rec.discharge_date - rec.date_admission).total_seconds() / 86400
+            else:
+                rec.stay_duration = 0.0
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('reference', _('New')) == _('New'):
+                vals['reference'] = self.env['ir.sequence'].next_by_code('hospital.admission') or _('New')
+        return super(HospitalAdmission, self).create(vals_list)
+
     @api.model
-    def create(self, vals):
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code('hospital.admission') or _('New')
-        return super(HospitalAdmission, self).create(vals)
+    def admit_patients(self, vals_list):
+        """Create and admit several admissions at once (e.g. mass-casualty intake)"""
+        admissions = self.create(vals_list)
+        admissions.action_admit()
+        return admissions
 
     def action_admit(self):
-        for rec in self:
-            if not rec.bed_id:
-                raise ValidationError(_("Please select a bed for admission!"))
-            if rec.bed_id.state != 'free':
-                raise ValidationError(_("The selected bed is not free!"))
-            rec.bed_id.state = 'occupied'
-            rec.state = 'active'
+        self.with_context(hospital_strict_bed_check=True).write({'state': 'active'})
     
     def action_discharge(self):
-        for rec in self:
-            rec.discharge_date = fields.Datetime.now()
-            if rec.bed_id:
-                rec.bed_id.state = 'free'
-            rec.state = 'discharged'
+        self.discharge_admissions()
+
+    def discharge_admissions(self, discharge_date=None, summary_template=None):
+        """Discharge all the active admissions in self in one pass (e.g. end-of-day ward round).
+
+        Admissions and beds are written with grouped, untracked writes and a
+        single chatter note is then logged per admission in one batch.
+        ``summary_template`` fills empty discharge summaries; it may use the
+        {reference}, {patient}, {doctor}, {bed}, {date_admission},
+        {discharge_date} and {diagnosis} placeholders.
+        """
+        not_active = self.filtered(lambda a: a.state != 'active')
+        if not_active:
+            raise ValidationError(_("Only active admissions can be discharged: %s") % ', '.join(not_active.mapped('reference')))
+        discharge_date = discharge_date or fields.Datetime.now()
+        beds = {rec.id: rec.bed_id.name for rec in self if rec.bed_id}
+        untracked = self.with_context(tracking_disable=True)
+        untracked.write({'discharge_date': discharge_date, 'state': 'discharged'})
+
+        if summary_template:
+            summaries = {}
+            for rec in untracked.filtered(lambda r: not r.discharge_summary):
+                try:
+                    summary = summary_template.format(
+                        reference=rec.reference,
+                        patient=rec.patient_id.name,
+                        doctor=rec.doctor_id.name or '',
+                        bed=rec.bed_id.name or '',
+                        date_admission=fields.Datetime.to_string(rec.date_admission),
+                        discharge_date=fields.Datetime.to_string(rec.discharge_date),
+                        diagnosis=rec.diagnosis or '',
+                    )
+                except (KeyError, IndexError, ValueError) as e:
+                    raise ValidationError(_("Invalid discharge summary template: %s") % e)
+                summaries.setdefault(summary, untracked.browse())
+                summaries[summary] |= rec
+            for summary, records in summaries.items():
+                records.write({'discharge_summary': summary})
+
+        self._message_log_batch(bodies={
+            rec.id: _("Patient discharged on %s, bed %s released.") % (fields.Datetime.to_string(discharge_date), beds[rec.id])
+            if rec.id in beds else _("Patient discharged on %s.") % fields.Datetime.to_string(discharge_date)
+            for rec in self
+        })
+        return True
 
     def action_cancel(self):
+        self.write({'state': 'cancel'})
+
+    def _allocate_beds(self, bed=None, strict=False):
+        """Lock and assign beds to all the admissions in self in one pass.
+
+        Each admission gets ``bed`` or its own bed. The beds are row-locked
+        before being checked, so two desks cannot allocate the same bed.
+        With ``strict``, the beds must also be in the 'free' state.
+        """
+        beds = self.env['hospital.bed']
         for rec in self:
-            if rec.state == 'active' and rec.bed_id:
-                rec.bed_id.state = 'free'
-            rec.state = 'cancel'
+            target_bed = bed or rec.bed_id
+            if not target_bed:
+                raise ValidationError(_("Please select a bed for admission!"))
+            beds |= target_bed
+        if len(beds) < len(self):
+            raise ValidationError(_("Several admissions cannot be assigned to the same bed!"))
+
+        beds._lock_for_allocation()
+        if strict and beds.filtered(lambda b: b.state != 'free'):
+            raise ValidationError(_("The selected bed is not free!"))
+
+        # Check for ACTUAL active admissions on these beds, excluding the ones being allocated
+        existing_active = self.search([
+            ('bed_id', 'in', beds.ids),
+            ('state', '=', 'active'),
+            ('id', 'not in', self.ids)
+        ], limit=1)
+        if existing_active:
+            raise ValidationError(_("The bed is occupied by patient %s (Reference: %s)") % (existing_active.patient_id.name, existing_active.reference))
+
+        # Mark beds as occupied (even if one was already 'occupied' by mistake/phantom)
+        beds.write({'state': 'occupied'})
 
     def write(self, vals):
-        # 1. Handle state change to 'discharged' or 'cancel' (Free the bed)
-        if vals.get('state') in ['discharged', 'cancel']:
-             for rec in self:
-                 if rec.bed_id and rec.bed_id.state == 'occupied':
-                     rec.bed_id.state = 'free'
-                 if vals.get('state') == 'discharged' and not rec.discharge_date:
-                     rec.discharge_date = fields.Datetime.now()
-
-        # 2. Handle state change to 'active' (re-admission) or initial activation
-        if vals.get('state') == 'active':
-            for rec in self:
-                if rec.state != 'active':
-                    # Determine which bed we are validating (current or new)
-                    target_bed_id = vals.get('bed_id') or rec.bed_id.id
-                    if target_bed_id:
-                        # Check for ACTUAL active admissions for this bed, excluding current record
-                        existing_active = self.search([
-                            ('bed_id', '=', target_bed_id),
-                            ('state', '=', 'active'),
-                            ('id', '!=', rec.id)
-                        ], limit=1)
-                        
-                        if existing_active:
-                             raise ValidationError(_("The bed is occupied by patient %s (Reference: %s)") % (existing_active.patient_id.name, existing_active.reference))
-                        
-                        # Mark bed as occupied (even if it was already 'occupied' by mistake/phantom)
-                        self.env['hospital.bed'].browse(target_bed_id).write({'state': 'occupied'})
-                        rec.discharge_date = False
-
-        # 3. Handle bed change (independent of state change, or WITH state change)
-        if vals.get('bed_id'):
-            for rec in self:
-                old_bed = rec.bed_id
-                new_bed_id = vals.get('bed_id')
-                
-                if old_bed.id != new_bed_id:
-                     # If we are active (or becoming active), the OLD bed must be freed
-                     # But only if we are truly moving (not just setting same ID)
-                     is_becoming_active = (vals.get('state') == 'active') or (rec.state == 'active' and vals.get('state') != 'discharged')
-                     
-                     if is_becoming_active and old_bed:
-                         old_bed.write({'state': 'free'})
-                     
-                     if is_becoming_active:
-                         # We already validated availability in Block 2 if state is changing to active.
-                         # But if state IS ALREADY active and we just change bed, we must validate new bed here.
-                         if not vals.get('state') == 'active': # If not handled by Block 2
-                             existing_active = self.search([
-                                ('bed_id', '=', new_bed_id),
-                                ('state', '=', 'active'),
-                                ('id', '!=', rec.id)
-                             ], limit=1)
-                             if existing_active:
-                                 raise ValidationError(_("The bed is occupied by patient %s") % existing_active.patient_id.name)
-                             self.env['hospital.bed'].browse(new_bed_id).write({'state': 'occupied'})
-
-        return super(HospitalAdmission, self).write(vals)
+        new_state = vals.get('state')
+        new_bed = self.env['hospital.bed'].browse(vals['bed_id']) if vals.get('bed_id') else None
+        leaving = new_state in ['discharged', 'cancel']
+
+        # 1. Handle state change to 'discharged' or 'cancel' (Free the beds)
+        if leaving:
+            self.filtered(lambda r: r.state == 'active').bed_id.filtered(lambda b: b.state == 'occupied').write({'state': 'free'})
+
+        # 2. Admissions becoming active, and active admissions moving to another bed
+        to_activate = self.filtered(lambda r: r.state != 'active') if new_state == 'active' else self.browse()
+        moving = self.filtered(lambda r: r.state == 'active' and r.bed_id != new_bed) if new_bed and not leaving else self.browse()
+        if to_activate or moving:
+            old_beds = moving.bed_id
+            (to_activate | moving)._allocate_beds(new_bed, strict=self.env.context.get('hospital_strict_bed_check'))
+            old_beds.write({'state': 'free'})
+
+        missing_discharge_date = self.filtered(lambda r: not r.discharge_date) if new_state == 'discharged' and 'discharge_date' not in vals else self.browse()
+        res = super(HospitalAdmission, self).write(vals)
+
+        if missing_discharge_date:
+            missing_discharge_date.write({'discharge_date': fields.Datetime.now()})
+        readmitted = to_activate.filtered('discharge_date')
+        if readmitted:
+            readmitted.write({'discharge_date': False})
+        return res
+
+    @api.model
+    def get_occupancy_timeline(self, date_from, date_to, granularity='day', groupby=None):
+        """Bed occupancy per hour or day between date_from and date_to.
+
+        Admissions are streamed from the database as plain intervals and
+        counted into the time buckets with a difference array, in one pass.
+        Planned (draft) admissions starting from now are projected with the
+        average stay of their admission type. With groupby ('room',
+        'room_type' or 'department') a series is returned per group.
+        Returns {'periods': [...], 'series': [{'key', 'label', 'capacity',
+        'occupied': [...], 'projected': [...]}]}.
+        """
+        if granularity not in TIMELINE_STEPS or groupby not in TIMELINE_GROUPS:
+            raise ValidationError(_("Unsupported granularity or grouping."))
+        step = TIMELINE_STEPS[granularity]
+        range_start = datetime.combine(fields.Date.to_date(date_from), time())
+        range_end = datetime.combine(fields.Date.to_date(date_to), time()) + timedelta(days=1)
+        size = math.ceil((range_end - range_start) / step)
+        now = fields.Datetime.now()
+        key_sql, label_sql = TIMELINE_GROUPS[groupby]
+        self.env.flush_all()
+        cr = self.env.cr
+
+        # Average stay per admission type, used to project planned admissions
+        cr.execute("""
+            SELECT admission_type, AVG(discharge_date - date_admission)
+              FROM hospital_admission
+             WHERE state = 'discharged' AND discharge_date > date_admission
+          GROUP BY admission_type
+        """)
+        average_stays = dict(cr.fetchall())
+        default_stay = timedelta(days=1)
+
+        # Capacity (active beds) per group
+        cr.execute("""
+            SELECT %s, COUNT(*)
+              FROM hospital_bed bed
+         LEFT JOIN hospital_room room ON room.id = bed.room_id
+         LEFT JOIN hospital_department dept ON dept.id = room.department_id
+             WHERE bed.active
+          GROUP BY 1
+        """ % key_sql)
+        capacities = dict(cr.fetchall())
+
+        series = {}
+        room_types = dict(self.env['hospital.room']._fields['room_type']._description_selection(self.env))
+
+        def get_series(key, label):
+            if key not in series:
+                series[key] = {
+                    'key': key,
+                    'label': room_types.get(key, key) if groupby == 'room_type' else label,
+                    'capacity': capacities.get(key, 0),
+                    'occupied': [0] * (size + 1),
+                    'projected': [0] * (size + 1),
+                }
+            return series[key]
+
+        def add_interval(counts, start, end):
+            first = max(0, (start - range_start) // step)
+            last = min(size - 1, math.ceil((end - range_start) / step) - 1)
+            if last >= first:
+                counts[first] += 1
+                counts[last + 1] -= 1
+
+        cr.execute("""
+            SELECT adm.date_admission, adm.discharge_date, adm.state, adm.admission_type, %s, %s
+              FROM hospital_admission adm
+         LEFT JOIN hospital_bed bed ON bed.id = adm.bed_id
+         LEFT JOIN hospital_room room ON room.id = bed.room_id
+         LEFT JOIN hospital_department dept ON dept.id = room.department_id
+             WHERE adm.date_admission < %%(range_end)s
+               AND (adm.discharge_date IS NULL OR adm.discharge_date > %%(range_start)s)
+               AND (adm.state IN ('active', 'discharged')
+                    OR (adm.state = 'draft' AND adm.date_admission >= %%(now)s))
+        """ % (key_sql, label_sql), {'range_start': range_start, 'range_end': range_end, 'now': now})
+        while True:
+            rows = cr.fetchmany(10000)
+            if not rows:
+                break
+            for start, end, state, admission_type, key, label in rows:
+                group = get_series(key, label)
+                if state == 'draft':
+                    add_interval(group['projected'], start, end or start + average_stays.get(admission_type, default_stay))
+                    continue
+                # Active admissions are projected to stay until the end of the range
+                add_interval(group['occupied'], start, end or (now if state == 'active' else start))
+                add_interval(group['projected'], start, end or range_end)
+
+        if groupby is None:
+            get_series(None, None)
+        for group in series.values():
+            if group['key'] is None:
+                group['label'] = _('All Beds') if groupby is None else _('Unassigned')
+            for counts in (group['occupied'], group['projected']):
+                counts.pop()
+                total = 0
+                for index, delta in enumerate(counts):
+                    total += delta
+                    counts[index] = total
+        return {
+            'periods': [fields.Datetime.to_string(range_start + step * index) for index in range(size)],
+            'series': sorted(series.values(), key=lambda group: (group['key'] is None, str(group['label']))),
+        }
 
     def unlink(self):
         for rec in self:
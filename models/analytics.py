@@ -1,10 +1,89 @@
 from odoo import api, fields, models, _
-from datetime import datetime, timedelta
+from odoo.exceptions import ValidationError
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
+import csv
+import io
 import logging
 
 _logger = logging.getLogger(__name__)
 
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+EXPORT_CHUNK_SIZE = 5000
+
+# Row-level export queries, paginated on their first column: the id of a record
+# of the first listed model, the model each row belongs to
+EXPORT_QUERIES = {
+    'financial': (
+        ['Bill', 'Bill Date', 'Patient', 'Status', 'Payment Method', 'Type', 'Description', 'Quantity', 'Unit Price', 'Subtotal'],
+        ['hospital.bill.line', 'hospital.bill', 'hospital.patient'],
+        """
+        SELECT line.id, bill.reference, bill.date_bill, patient.name, bill.state, bill.payment_method,
+               line.product_type, line.description, line.quantity, line.unit_price, line.subtotal
+          FROM hospital_bill_line line
+          JOIN hospital_bill bill ON bill.id = line.bill_id
+          JOIN hospital_patient patient ON patient.id = bill.patient_id
+         WHERE bill.date_bill >= %(date_from)s
+           AND bill.date_bill <= %(date_to)s
+           AND line.id > %(last_id)s
+      ORDER BY line.id
+         LIMIT %(limit)s
+        """,
+    ),
+    'operational': (
+        ['Admission', 'Patient', 'Doctor', 'Admission Date', 'Discharge Date', 'Type', 'Status', 'Bed'],
+        ['hospital.admission', 'hospital.patient', 'hospital.doctor', 'hospital.bed'],
+        """
+        SELECT adm.id, adm.reference, patient.name, doctor.name, adm.date_admission, adm.discharge_date,
+               adm.admission_type, adm.state, bed.name
+          FROM hospital_admission adm
+          JOIN hospital_patient patient ON patient.id = adm.patient_id
+     LEFT JOIN hospital_doctor doctor ON doctor.id = adm.doctor_id
+     LEFT JOIN hospital_bed bed ON bed.id = adm.bed_id
+         WHERE adm.date_admission >= %(date_from)s
+           AND adm.date_admission < %(date_to)s::date + interval '1 day'
+           AND adm.id > %(last_id)s
+      ORDER BY adm.id
+         LIMIT %(limit)s
+        """,
+    ),
+    'patient': (
+        ['Patient', 'Gender', 'Date of Birth', 'Blood Group', 'Phone', 'Email', 'Registered On'],
+        ['hospital.patient'],
+        """
+        SELECT patient.id, patient.name, patient.gender, patient.date_of_birth, patient.blood_group,
+               patient.phone, patient.email, patient.create_date
+          FROM hospital_patient patient
+         WHERE patient.create_date >= %(date_from)s
+           AND patient.create_date < %(date_to)s::date + interval '1 day'
+           AND patient.id > %(last_id)s
+      ORDER BY patient.id
+         LIMIT %(limit)s
+        """,
+    ),
+    'doctor': (
+        ['Appointment', 'Date', 'Doctor', 'Department', 'Patient', 'Type', 'Status', 'Duration (hours)'],
+        ['hospital.appointment', 'hospital.doctor', 'hospital.department', 'hospital.patient'],
+        """
+        SELECT apt.id, apt.reference, apt.date_appointment, doctor.name, dept.name, patient.name,
+               apt.appointment_type, apt.state, apt.duration
+          FROM hospital_appointment apt
+          JOIN hospital_doctor doctor ON doctor.id = apt.doctor_id
+     LEFT JOIN hospital_department dept ON dept.id = doctor.department_id
+          JOIN hospital_patient patient ON patient.id = apt.patient_id
+         WHERE apt.date_appointment >= %(date_from)s
+           AND apt.date_appointment < %(date_to)s::date + interval '1 day'
+           AND apt.id > %(last_id)s
+      ORDER BY apt.id
+         LIMIT %(limit)s
+        """,
+    ),
+}
+
 class HospitalAnalytics(models.TransientModel):
     _name = 'hospital.analytics'
     _description = 'Hospital Analytics and Reports'
@@ -17,35 +96,55 @@ class HospitalAnalytics(models.TransientModel):
         ('patient', 'Patient Analytics'),
         ('doctor', 'Doctor Performance'),
     ], string='Report Type', default='financial')
+    export_format = fields.Selection([
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ], string='Export Format', default='csv', required=True)
+    department_id = fields.Many2one('hospital.department', string='Department', help='Restrict the doctor report to one department')
+    specialization_id = fields.Many2one('hospital.specialization', string='Specialization', help='Restrict the doctor report to one specialization')
 
     def generate_financial_report(self):
         """Generate comprehensive financial report"""
         self.ensure_one()
         
-        bills = self.env['hospital.bill'].search([
+        bill_domain = [
             ('date_bill', '>=', self.date_from),
             ('date_bill', '<=', self.date_to)
-        ])
+        ]
         
-        total_revenue = sum(bills.filtered(lambda b: b.state == 'paid').mapped('total_amount'))
-        pending_revenue = sum(bills.filtered(lambda b: b.state == 'draft').mapped('total_amount'))
-        insurance_claims = sum(bills.mapped('insurance_coverage'))
-        patient_payments = sum(bills.mapped('patient_payable'))
+        # One grouped pass over the bills: totals per (state, payment method)
+        bill_groups = self.env['hospital.bill']._read_group(
+            bill_domain,
+            groupby=['state', 'payment_method'],
+            aggregates=['__count', 'total_amount:sum', 'insurance_coverage:sum', 'patient_payable:sum'],
+        )
         
-        # Revenue by payment method
-        revenue_by_method = {}
-        for method in ['cash', 'card', 'insurance', 'bank_transfer']:
-            method_bills = bills.filtered(lambda b: b.payment_method == method and b.state == 'paid')
-            revenue_by_method[method] = sum(method_bills.mapped('total_amount'))
+        total_revenue = pending_revenue = insurance_claims = patient_payments = 0
+        total_bills = paid_bills = pending_bills = 0
+        revenue_by_method = dict.fromkeys(['cash', 'card', 'insurance', 'bank_transfer'], 0)
         
-        # Revenue by service type
-        revenue_by_service = {}
-        for bill in bills.filtered(lambda b: b.state == 'paid'):
-            for line in bill.bill_line_ids:
-                service_type = line.product_type
-                if service_type not in revenue_by_service:
-                    revenue_by_service[service_type] = 0
-                revenue_by_service[service_type] += line.subtotal
+        for state, method, count, total, coverage, payable in bill_groups:
+            total_bills += count
+            insurance_claims += coverage
+            patient_payments += payable
+            if state == 'paid':
+                paid_bills += count
+                total_revenue += total
+                if method in revenue_by_method:
+                    revenue_by_method[method] += total
+            elif state == 'draft':
+                pending_bills += count
+                pending_revenue += total
+        
+        # Revenue by service type (lines of paid bills only)
+        line_groups = self.env['hospital.bill.line']._read_group(
+            [('bill_id.date_bill', '>=', self.date_from),
+             ('bill_id.date_bill', '<=', self.date_to),
+             ('bill_id.state', '=', 'paid')],
+            groupby=['product_type'],
+            aggregates=['subtotal:sum'],
+        )
+        revenue_by_service = {service_type: subtotal for service_type, subtotal in line_groups}
         
         return {
             'total_revenue': total_revenue,
@@ -54,9 +153,9 @@ class HospitalAnalytics(models.TransientModel):
             'patient_payments': patient_payments,
             'revenue_by_method': revenue_by_method,
             'revenue_by_service': revenue_by_service,
-            'total_bills': len(bills),
-            'paid_bills': len(bills.filtered(lambda b: b.state == 'paid')),
-            'pending_bills': len(bills.filtered(lambda b: b.state == 'draft')),
+            'total_bills': total_bills,
+            'paid_bills': paid_bills,
+            'pending_bills': pending_bills,
         }
 
     def generate_operational_report(self):
@@ -64,37 +163,31 @@ class HospitalAnalytics(models.TransientModel):
         self.ensure_one()
         
         # Appointment metrics
-        appointments = self.env['hospital.appointment'].search([
+        appointment_states = dict(self.env['hospital.appointment']._read_group([
             ('date_appointment', '>=', self.date_from),
             ('date_appointment', '<=', self.date_to)
-        ])
+        ], groupby=['state'], aggregates=['__count']))
         
         appointment_stats = {
-            'total': len(appointments),
-            'confirmed': len(appointments.filtered(lambda a: a.state == 'confirmed')),
-            'done': len(appointments.filtered(lambda a: a.state == 'done')),
-            'cancelled': len(appointments.filtered(lambda a: a.state == 'cancel')),
+            'total': sum(appointment_states.values()),
+            'confirmed': appointment_states.get('confirmed', 0),
+            'done': appointment_states.get('done', 0),
+            'cancelled': appointment_states.get('cancel', 0),
         }
         
         # Admission metrics
-        admissions = self.env['hospital.admission'].search([
-            ('admission_date', '>=', self.date_from),
-            ('admission_date', '<=', self.date_to)
-        ])
-        
-        total_stay_days = 0
-        for admission in admissions.filtered(lambda a: a.discharge_date):
-            stay = (admission.discharge_date - admission.admission_date).days
-            total_stay_days += stay
-        
-        avg_stay = total_stay_days / len(admissions) if admissions else 0
-        
+        admission_states = dict(self.env['hospital.admission']._read_group([
+            ('date_admission', '>=', self.date_from),
+            ('date_admission', '<', self.date_to + timedelta(days=1))
+        ], groupby=['state'], aggregates=['__count']))
+        length_of_stay = self._get_length_of_stay_stats()
+
         # Bed utilization
         total_beds = self.env['hospital.bed'].search_count([('active', '=', True)])
         occupied_beds = self.env['hospital.bed'].search_count([('state', '=', 'occupied')])
         
         # Prescription metrics
-        prescriptions = self.env['hospital.prescription'].search([
+        prescription_count = self.env['hospital.prescription'].search_count([
             ('prescription_date', '>=', self.date_from),
             ('prescription_date', '<=', self.date_to)
         ])
@@ -102,10 +195,11 @@ class HospitalAnalytics(models.TransientModel):
         return {
             'appointments': appointment_stats,
             'admissions': {
-                'total': len(admissions),
-                'active': len(admissions.filtered(lambda a: a.state == 'admitted')),
-                'discharged': len(admissions.filtered(lambda a: a.state == 'discharged')),
-                'average_stay_days': round(avg_stay, 2),
+                'total': sum(admission_states.values()),
+                'active': admission_states.get('active', 0),
+                'discharged': admission_states.get('discharged', 0),
+                'average_stay_days': length_of_stay['overall']['average'],
+                'length_of_stay': length_of_stay,
             },
             'beds': {
                 'total': total_beds,
@@ -114,31 +208,79 @@ class HospitalAnalytics(models.TransientModel):
                 'occupancy_rate': round((occupied_beds / total_beds * 100) if total_beds > 0 else 0, 2),
             },
             'prescriptions': {
-                'total': len(prescriptions),
+                'total': prescription_count,
+            }
+        }
+
+    def _get_length_of_stay_stats(self):
+        """Average, median and 90th percentile stay (in days) of the admissions discharged
+        in the period, overall and per department, doctor and admission type, in one query"""
+        self.env['hospital.admission'].flush_model(['stay_duration', 'date_admission', 'discharge_date', 'state', 'doctor_id', 'admission_type'])
+        self.env.cr.execute("""
+            SELECT GROUPING(dept.id, doctor.id, adm.admission_type),
+                   dept.id, dept.name, doctor.id, doctor.name, adm.admission_type,
+                   COUNT(*), AVG(adm.stay_duration),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY adm.stay_duration),
+                   percentile_cont(0.9) WITHIN GROUP (ORDER BY adm.stay_duration)
+              FROM hospital_admission adm
+         LEFT JOIN hospital_doctor doctor ON doctor.id = adm.doctor_id
+         LEFT JOIN hospital_department dept ON dept.id = doctor.department_id
+             WHERE adm.state = 'discharged'
+               AND adm.discharge_date IS NOT NULL
+               AND adm.date_admission >= %s
+               AND adm.date_admission < %s
+          GROUP BY GROUPING SETS ((), (dept.id, dept.name), (doctor.id, doctor.name), (adm.admission_type))
+        """, (self.date_from, self.date_to + timedelta(days=1)))
+
+        def stats(count, average, median, p90):
+            return {
+                'count': count,
+                'average': round(average or 0.0, 2),
+                'median': round(median or 0.0, 2),
+                'p90': round(p90 or 0.0, 2),
             }
+
+        admission_types = dict(self.env['hospital.admission']._fields['admission_type']._description_selection(self.env))
+        result = {
+            'overall': stats(0, 0.0, 0.0, 0.0),
+            'by_department': [],
+            'by_doctor': [],
+            'by_admission_type': [],
         }
+        for grouping, dept_id, dept_name, doctor_id, doctor_name, admission_type, *values in self.env.cr.fetchall():
+            # GROUPING() bits: department (4), doctor (2), admission type (1) are left out of the set
+            if grouping == 7:
+                result['overall'] = stats(*values)
+            elif grouping == 3:
+                result['by_department'].append(dict(stats(*values), department_id=dept_id, department=dept_name or _('Unassigned')))
+            elif grouping == 5:
+                result['by_doctor'].append(dict(stats(*values), doctor_id=doctor_id, doctor=doctor_name or _('Unassigned')))
+            elif grouping == 6:
+                result['by_admission_type'].append(dict(stats(*values), admission_type=admission_type, label=admission_types.get(admission_type, _('Undefined'))))
+        for key in ('by_department', 'by_doctor', 'by_admission_type'):
+            result[key].sort(key=lambda row: row['average'], reverse=True)
+        return result
 
     def generate_patient_analytics(self):
         """Generate patient analytics report"""
         self.ensure_one()
+        Patient = self.env['hospital.patient']
         
         # New patients in period
-        new_patients = self.env['hospital.patient'].search([
+        new_patients = Patient.search_count([
             ('create_date', '>=', self.date_from),
             ('create_date', '<=', self.date_to)
         ])
         
         # Patient demographics
-        total_patients = self.env['hospital.patient'].search_count([('active', '=', True)])
+        total_patients = Patient.search_count([('active', '=', True)])
         
-        gender_distribution = {
-            'male': self.env['hospital.patient'].search_count([('gender', '=', 'male'), ('active', '=', True)]),
-            'female': self.env['hospital.patient'].search_count([('gender', '=', 'female'), ('active', '=', True)]),
-            'other': self.env['hospital.patient'].search_count([('gender', '=', 'other'), ('active', '=', True)]),
-        }
+        gender_distribution = dict.fromkeys(['male', 'female', 'other'], 0)
+        for gender, count in Patient._read_group([('active', '=', True)], groupby=['gender'], aggregates=['__count']):
+            if gender in gender_distribution:
+                gender_distribution[gender] = count
         
-        # Age distribution
-        patients = self.env['hospital.patient'].search([('active', '=', True)])
+        # Age distribution, bucketed from date_of_birth by the database
         age_groups = {
             '0-18': 0,
             '19-35': 0,
@@ -146,51 +288,42 @@ class HospitalAnalytics(models.TransientModel):
             '56-75': 0,
             '75+': 0,
         }
-        
-        for patient in patients:
-            age = patient.age
-            if age <= 18:
-                age_groups['0-18'] += 1
-            elif age <= 35:
-                age_groups['19-35'] += 1
-            elif age <= 55:
-                age_groups['36-55'] += 1
-            elif age <= 75:
-                age_groups['56-75'] += 1
-            else:
-                age_groups['75+'] += 1
+        Patient.flush_model(['date_of_birth', 'active'])
+        self.env.cr.execute("""
+            SELECT CASE
+                       WHEN age <= 18 THEN '0-18'
+                       WHEN age <= 35 THEN '19-35'
+                       WHEN age <= 55 THEN '36-55'
+                       WHEN age <= 75 THEN '56-75'
+                       ELSE '75+'
+                   END AS age_group,
+                   COUNT(*)
+              FROM (
+                    SELECT COALESCE(date_part('year', age(%s::date, date_of_birth)), 0) AS age
+                      FROM hospital_patient
+                     WHERE active
+                   ) ages
+          GROUP BY age_group
+        """, (fields.Date.today(),))
+        age_groups.update(self.env.cr.fetchall())
         
         # Blood group distribution
-        blood_groups = {}
-        for group in ['a+', 'a-', 'b+', 'b-', 'ab+', 'ab-', 'o+', 'o-']:
-            count = self.env['hospital.patient'].search_count([
-                ('blood_group', '=', group),
-                ('active', '=', True)
-            ])
+        blood_groups = dict.fromkeys(['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-'], 0)
+        for group, count in Patient._read_group([('active', '=', True), ('blood_group', '!=', False)], groupby=['blood_group'], aggregates=['__count']):
             blood_groups[group.upper()] = count
         
         # Most frequent patients (by appointment count)
-        appointments = self.env['hospital.appointment'].search([
-            ('date_appointment', '>=', self.date_from),
-            ('date_appointment', '<=', self.date_to)
-        ])
-        
-        patient_visit_count = {}
-        for apt in appointments:
-            patient_id = apt.patient_id.id
-            if patient_id not in patient_visit_count:
-                patient_visit_count[patient_id] = {
-                    'name': apt.patient_id.name,
-                    'count': 0
-                }
-            patient_visit_count[patient_id]['count'] += 1
-        
-        # Sort by visit count
-        top_patients = sorted(patient_visit_count.values(), key=lambda x: x['count'], reverse=True)[:10]
+        top_patients = [
+            {'name': patient.name, 'count': count}
+            for patient, count in self.env['hospital.appointment']._read_group([
+                ('date_appointment', '>=', self.date_from),
+                ('date_appointment', '<=', self.date_to)
+            ], groupby=['patient_id'], aggregates=['__count'], order='__count DESC', limit=10)
+        ]
         
         return {
             'total_patients': total_patients,
-            'new_patients': len(new_patients),
+            'new_patients': new_patients,
             'gender_distribution': gender_distribution,
             'age_distribution': age_groups,
             'blood_group_distribution': blood_groups,
@@ -201,47 +334,67 @@ class HospitalAnalytics(models.TransientModel):
         """Generate doctor performance report"""
         self.ensure_one()
         
-        doctors = self.env['hospital.doctor'].search([('active', '=', True)])
-        doctor_stats = []
+        doctor_domain = [('active', '=', True)]
+        if self.department_id:
+            doctor_domain.append(('department_id', '=', self.department_id.id))
+        if self.specialization_id:
+            doctor_domain.append(('specialization_ids', 'in', self.specialization_id.ids))
+        doctors = self.env['hospital.doctor'].search(doctor_domain)
         
-        for doctor in doctors:
-            # Appointments handled
-            appointments = self.env['hospital.appointment'].search([
-                ('doctor_id', '=', doctor.id),
-                ('date_appointment', '>=', self.date_from),
-                ('date_appointment', '<=', self.date_to)
-            ])
-            
-            # Prescriptions written
-            prescriptions = self.env['hospital.prescription'].search([
-                ('doctor_id', '=', doctor.id),
+        # Appointments handled / completed, grouped per doctor
+        appointment_counts = {}
+        done_counts = {}
+        for doctor, state, count in self.env['hospital.appointment']._read_group([
+            ('doctor_id', 'in', doctors.ids),
+            ('date_appointment', '>=', self.date_from),
+            ('date_appointment', '<=', self.date_to)
+        ], groupby=['doctor_id', 'state'], aggregates=['__count']):
+            appointment_counts[doctor.id] = appointment_counts.get(doctor.id, 0) + count
+            if state == 'done':
+                done_counts[doctor.id] = count
+        
+        # Prescriptions written
+        prescription_counts = {
+            doctor.id: count
+            for doctor, count in self.env['hospital.prescription']._read_group([
+                ('doctor_id', 'in', doctors.ids),
                 ('prescription_date', '>=', self.date_from),
                 ('prescription_date', '<=', self.date_to)
-            ])
-            
-            # Revenue generated
-            bills = self.env['hospital.bill'].search([
-                ('appointment_id.doctor_id', '=', doctor.id),
-                ('date_bill', '>=', self.date_from),
-                ('date_bill', '<=', self.date_to),
-                ('state', '=', 'paid')
-            ])
-            
-            total_revenue = sum(bills.mapped('total_amount'))
-            
-            # Completion rate
-            completed = len(appointments.filtered(lambda a: a.state == 'done'))
-            completion_rate = (completed / len(appointments) * 100) if appointments else 0
+            ], groupby=['doctor_id'], aggregates=['__count'])
+        }
+        
+        # Revenue generated (paid bills linked through their appointment)
+        revenue = {}
+        if doctors:
+            self.env['hospital.bill'].flush_model(['appointment_id', 'date_bill', 'state', 'total_amount'])
+            self.env['hospital.appointment'].flush_model(['doctor_id'])
+            self.env.cr.execute("""
+                SELECT a.doctor_id, SUM(b.total_amount)
+                  FROM hospital_bill b
+                  JOIN hospital_appointment a ON a.id = b.appointment_id
+                 WHERE a.doctor_id IN %s
+                   AND b.date_bill >= %s
+                   AND b.date_bill <= %s
+                   AND b.state = 'paid'
+              GROUP BY a.doctor_id
+            """, (tuple(doctors.ids), self.date_from, self.date_to))
+            revenue = dict(self.env.cr.fetchall())
+        
+        doctor_stats = []
+        for doctor in doctors:
+            total_appointments = appointment_counts.get(doctor.id, 0)
+            completed = done_counts.get(doctor.id, 0)
+            completion_rate = (completed / total_appointments * 100) if total_appointments else 0
             
             doctor_stats.append({
                 'name': doctor.name,
                 'specialization': ', '.join(doctor.specialization_ids.mapped('name')) or 'General',
                 'department': doctor.department_id.name if doctor.department_id else 'N/A',
-                'appointments': len(appointments),
+                'appointments': total_appointments,
                 'completed_appointments': completed,
                 'completion_rate': round(completion_rate, 2),
-                'prescriptions': len(prescriptions),
-                'revenue_generated': total_revenue,
+                'prescriptions': prescription_counts.get(doctor.id, 0),
+                'revenue_generated': revenue.get(doctor.id, 0),
             })
         
         # Sort by appointments handled
@@ -257,7 +410,14 @@ class HospitalAnalytics(models.TransientModel):
         """Generate selected report"""
         self.ensure_one()
         
-        if self.report_type == 'financial':
+        # Reuse a result computed after the period closed
+        cached = self.env['hospital.report.job']._get_cached_job(
+            self.report_type, self.date_from, self.date_to,
+            self.department_id.id, self.specialization_id.id,
+        )
+        if cached:
+            data = cached.result
+        elif self.report_type == 'financial':
             data = self.generate_financial_report()
         elif self.report_type == 'operational':
             data = self.generate_operational_report()
@@ -277,3 +437,91 @@ class HospitalAnalytics(models.TransientModel):
             'target': 'new',
             'context': {'report_data': data}
         }
+
+    def action_generate_in_background(self):
+        """Queue the selected report, or open its cached result"""
+        self.ensure_one()
+        job = self.env['hospital.report.job'].request_report(
+            self.report_type, self.date_from, self.date_to,
+            self.department_id.id, self.specialization_id.id,
+        )
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Report Job'),
+            'res_model': 'hospital.report.job',
+            'view_mode': 'form',
+            'res_id': job.id,
+            'target': 'current',
+        }
+
+    def _iter_export_rows(self):
+        """Yield the header, then every row of the selected report, reading EXPORT_CHUNK_SIZE rows at a time.
+
+        The rows come from raw SQL. Access rights are checked on every model
+        read. Record rules are applied to the records the rows belong to (the
+        first model of the query), chunk by chunk. They are not applied to the
+        joined models, whose names are exported as they are.
+        """
+        self.ensure_one()
+        header, model_names, query = EXPORT_QUERIES[self.report_type]
+        for model_name in model_names:
+            self.env[model_name].check_access_rights('read')
+        RowModel = self.env[model_names[0]]
+        restricted = bool(self.env['ir.rule']._compute_domain(RowModel._name, 'read'))
+        self.env.flush_all()
+        
+        yield header
+        last_id = 0
+        while True:
+            self.env.cr.execute(query, {
+                'date_from': self.date_from,
+                'date_to': self.date_to,
+                'last_id': last_id,
+                'limit': EXPORT_CHUNK_SIZE,
+            })
+            rows = self.env.cr.fetchall()
+            allowed_ids = set(RowModel.search([('id', 'in', [row[0] for row in rows])]).ids) if restricted and rows else None
+            for row in rows:
+                if allowed_ids is None or row[0] in allowed_ids:
+                    yield row[1:]
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                break
+            last_id = rows[-1][0]
+
+    def _get_export_filename(self):
+        self.ensure_one()
+        return '%s_report_%s_%s.%s' % (self.report_type, self.date_from, self.date_to, self.export_format)
+
+    def _write_export(self, fileobj):
+        """Write the row-level export to a binary file object, row by row"""
+        self.ensure_one()
+        if self.export_format == 'xlsx':
+            if xlsxwriter is None:
+                raise ValidationError(_("The Python library 'xlsxwriter' is required for Excel exports."))
+            workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+            worksheet = workbook.add_worksheet(self.report_type.title())
+            for index, row in enumerate(self._iter_export_rows()):
+                worksheet.write_row(index, 0, [
+                    fields.Datetime.to_string(value) if isinstance(value, datetime)
+                    else fields.Date.to_string(value) if isinstance(value, date) else value
+                    for value in row
+                ])
+            workbook.close()
+        else:
+            stream = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+            writer = csv.writer(stream)
+            for row in self._iter_export_rows():
+                writer.writerow(row)
+            stream.flush()
+            stream.detach()
+
+    def action_export_report(self):
+        """Download every row behind the selected report as CSV or XLSX"""
+        self.ensure_one()
+        if self.export_format == 'xlsx' and xlsxwriter is None:
+            raise ValidationError(_("The Python library 'xlsxwriter' is required for Excel exports."))
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/hospital/analytics/export/%s' % self.id,
+            'target': 'self',
+        }
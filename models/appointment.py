@@ -1,9 +1,21 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_index, index_exists
+from datetime import timedelta
+import logging
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+# Longest bookable appointment; bounds the window searched for overlaps
+MAX_APPOINTMENT_HOURS = 24
+
+# Attempts made to resend a confirmation email after a transient failure
+MAX_EMAIL_RETRIES = 3
 
 class HospitalAppointment(models.Model):
     _name = "hospital.appointment"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hospital.kpi.cache.mixin']
     _description = "Appointment"
     _rec_name = "reference"
     _order = "date_appointment desc"
@@ -13,6 +25,7 @@ class HospitalAppointment(models.Model):
     doctor_id = fields.Many2one('hospital.doctor', string="Doctor", required=True, tracking=True)
     date_appointment = fields.Datetime(string='Date', required=True, default=fields.Datetime.now, tracking=True)
     duration = fields.Float(string='Duration (hours)', default=0.5)
+    date_end = fields.Datetime(string='End Date', compute='_compute_date_end', store=True, precompute=True)
     appointment_type = fields.Selection([
         ('consultation', 'Consultation'),
         ('followup', 'Follow-up'),
@@ -27,41 +40,86 @@ class HospitalAppointment(models.Model):
         ('cancel', 'Cancelled'),
     ], string='Status', default='draft', required=True, tracking=True)
 
-    @api.constrains('doctor_id', 'date_appointment', 'duration')
+    _sql_constraints = [
+        ('doctor_no_overlap',
+         "EXCLUDE USING gist (doctor_id WITH =, "
+         "tsrange(date_appointment, date_appointment + COALESCE(duration, 0) * interval '1 hour') WITH &&) "
+         "WHERE (state != 'cancel')",
+         'The doctor is already booked at this time!'),
+    ]
+
+    def _auto_init(self):
+        # The overlap exclusion constraint needs btree_gist for the doctor_id equality
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        except psycopg2.Error:
+            _logger.warning("Could not create the btree_gist extension; appointment overlaps are only checked in Python.")
+        return super(HospitalAppointment, self)._auto_init()
+
+    def init(self):
+        if not index_exists(self.env.cr, 'hospital_appointment_doctor_date_index'):
+            create_index(self.env.cr, 'hospital_appointment_doctor_date_index', self._table, ['doctor_id', 'date_appointment'])
+
+    @api.depends('date_appointment', 'duration')
+    def _compute_date_end(self):
+        for rec in self:
+            rec.date_end = rec.date_appointment + timedelta(hours=rec.duration) if rec.date_appointment else False
+
+    @api.constrains('duration')
+    def _check_duration(self):
+        for rec in self:
+            if rec.duration < 0 or rec.duration > MAX_APPOINTMENT_HOURS:
+                raise ValidationError(_("Appointment duration must be between 0 and %s hours!") % MAX_APPOINTMENT_HOURS)
+
+    @api.constrains('doctor_id', 'date_appointment', 'duration', 'state')
     def check_doctor_availability(self):
+        # Validate the whole batch at once: per doctor, the new bookings are
+        # swept against each other and against the existing bookings of the
+        # window they span, fetched with a single query.
+        booking_ids_by_doctor = {}
         for rec in self:
-            if not rec.doctor_id or not rec.date_appointment:
-                continue
-            
-            # Calculate End Date
-            from datetime import timedelta
-            end_date = rec.date_appointment + timedelta(hours=rec.duration)
+            if rec.doctor_id and rec.date_appointment and rec.state != 'cancel':
+                booking_ids_by_doctor.setdefault(rec.doctor_id, []).append(rec.id)
+        for doctor, booking_ids in booking_ids_by_doctor.items():
+            bookings = self.browse(booking_ids)
+            window_start = min(bookings.mapped('date_appointment'))
+            window_end = max(bookings.mapped('date_end'))
             
-            # Search for overlapping appointments
-            # Logic: (StartA < EndB) and (EndA > StartB)
-            domain = [
-                ('doctor_id', '=', rec.doctor_id.id),
-                ('id', '!=', rec.id),
+            # Logic: (StartA < EndB) and (EndA > StartB), only within the
+            # window an appointment of at most MAX_APPOINTMENT_HOURS can reach
+            existing = self.search([
+                ('doctor_id', '=', doctor.id),
+                ('id', 'not in', bookings.ids),
                 ('state', '!=', 'cancel'),
-                ('date_appointment', '<', end_date),
-            ]
-            
-            overlapping_appointments = self.search(domain)
+                ('date_appointment', '<', window_end),
+                ('date_appointment', '>', window_start - timedelta(hours=MAX_APPOINTMENT_HOURS)),
+                ('date_end', '>', window_start),
+            ])
             
-            for appointment in overlapping_appointments:
-                appointment_end = appointment.date_appointment + timedelta(hours=appointment.duration)
-                if appointment_end > rec.date_appointment:
-                    raise ValidationError(_("Doctor %s is already booked at this time (Ref: %s).") % (rec.doctor_id.name, appointment.reference))
+            intervals = sorted(
+                [(apt.date_appointment, apt.date_end, apt, True) for apt in bookings]
+                + [(apt.date_appointment, apt.date_end, apt, False) for apt in existing],
+                key=lambda interval: interval[0],
+            )
+            active = []
+            for start, end, appointment, is_new in intervals:
+                active = [interval for interval in active if interval[1] > start]
+                for other_start, other_end, other, other_is_new in active:
+                    if (is_new or other_is_new) and end > other_start:
+                        booked = other if is_new else appointment
+                        raise ValidationError(_("Doctor %s is already booked at this time (Ref: %s).") % (doctor.name, booked.reference))
+                active.append((start, end, appointment, is_new))
 
-    @api.model
-    def create(self, vals):
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code('hospital.appointment') or _('New')
-        return super(HospitalAppointment, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('reference', _('New')) == _('New'):
+                vals['reference'] = self.env['ir.sequence'].next_by_code('hospital.appointment') or _('New')
+        return super(HospitalAppointment, self).create(vals_list)
 
     def action_confirm(self):
-        for rec in self:
-            rec.write({'state': 'confirmed'})
+        self.write({'state': 'confirmed'})
 
     def action_done(self):
         for rec in self:
@@ -72,27 +130,49 @@ class HospitalAppointment(models.Model):
             rec.state = 'cancel'
 
     def write(self, vals):
-        # 1. Execute the write
+        # 1. Remember which appointments are being confirmed
+        to_confirm = self.filtered(lambda a: a.state != 'confirmed') if vals.get('state') == 'confirmed' else self.browse()
+        
+        # 2. Execute the write
         res = super(HospitalAppointment, self).write(vals)
         
-        # 2. Check for state change to 'confirmed'
-        if vals.get('state') == 'confirmed':
-            for rec in self:
-                rec._send_confirmation_email()
+        # 3. Queue the confirmation emails of the whole batch
+        if to_confirm:
+            to_confirm._send_confirmation_email()
         return res
 
     def _send_confirmation_email(self):
-        """ Separate method to handle email sending logic """
-        self.ensure_one()
-        # Send Email Notification
-        if not self.patient_id.email:
-             # Warning instead of silent fail
-             raise ValidationError(_("Cannot send confirmation: Patient %s has no email address.") % self.patient_id.name)
+        """ Queue the confirmation emails, rendered in one batch and sent by the mail queue """
+        missing_email = self.filtered(lambda a: not a.patient_id.email)
+        for rec in missing_email:
+            # Warning on the appointment instead of rolling back the whole confirmation
+            rec.message_post(body=_("Cannot send confirmation: Patient %s has no email address.") % rec.patient_id.name)
         
-        try:
-            template = self.env.ref('gestion_hospitaliere.appointment_confirmation_email_template', raise_if_not_found=True)
-            template.send_mail(self.id, force_send=True)
-        except ValueError:
+        to_send = self - missing_email
+        if not to_send:
+            return
+        template = self.env.ref('gestion_hospitaliere.appointment_confirmation_email_template', raise_if_not_found=False)
+        if not template:
             raise ValidationError(_("Email Template 'appointment_confirmation_email_template' not found. Please update the module."))
-        except Exception as e:
-             raise ValidationError(_("Email sending failed: %s") % str(e))
+        template.send_mail_batch(to_send.ids, force_send=False, email_values={'hospital_confirmation': True})
+        self.env.ref('mail.ir_cron_mail_scheduler_action')._trigger()
+
+    @api.model
+    def _cron_retry_confirmation_emails(self):
+        """Cron job putting confirmation emails that failed on a transient error back in the mail queue"""
+        failed_mails = self.env['mail.mail'].sudo().search([
+            ('model', '=', self._name),
+            ('hospital_confirmation', '=', True),
+            ('state', '=', 'exception'),
+            ('failure_type', 'in', ['mail_smtp', 'unknown']),
+            ('hospital_retry_count', '<', MAX_EMAIL_RETRIES),
+        ])
+        for retry_count in set(failed_mails.mapped('hospital_retry_count')):
+            failed_mails.filtered(lambda m: m.hospital_retry_count == retry_count).write({
+                'state': 'outgoing',
+                'failure_type': False,
+                'failure_reason': False,
+                'hospital_retry_count': retry_count + 1,
+            })
+        if failed_mails:
+            self.env.ref('mail.ir_cron_mail_scheduler_action')._trigger()
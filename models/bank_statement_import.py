@@ -0,0 +1,202 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
+from odoo.tools import float_round
+from lxml import etree
+import base64
+import codecs
+import csv
+import io
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+PAYMENT_BATCH_SIZE = 1000
+
+# Accepted CSV column names, lower-cased
+CSV_REFERENCE_COLUMNS = ('reference', 'ref', 'communication', 'description', 'label')
+CSV_AMOUNT_COLUMNS = ('amount', 'credit')
+
+REFERENCE_TOKEN = re.compile(r'[\w/-]+')
+
+
+def _parse_amount(raw):
+    """Parse a statement amount such as 1234.56, 1,234.56, 1.234,56, 1 234,56 or 120,5"""
+    amount = re.sub(r"[\s'\u00a0\u202f]", '', raw or '')
+    if '.' in amount and ',' in amount:
+        # The right-most separator is the decimal one
+        thousands = ',' if amount.rfind('.') > amount.rfind(',') else '.'
+        amount = amount.replace(thousands, '').replace(',', '.')
+    elif amount.count(',') == 1 and not re.search(r',\d{3}$', amount):
+        amount = amount.replace(',', '.')
+    elif amount.count(',') or amount.count('.') > 1:
+        amount = amount.replace(',', '').replace('.', '')
+    return float(amount)
+
+
+def _to_cents(amount):
+    return int(float_round(amount * 100, precision_digits=0))
+
+
+def _local_name(element):
+    return etree.QName(element).localname
+
+
+class HospitalBankStatementImport(models.TransientModel):
+    _name = 'hospital.bank.statement.import'
+    _description = 'Bank Statement Payment Import'
+
+    statement_file = fields.Binary(string='Statement File', required=True)
+    filename = fields.Char(string='File Name')
+    file_format = fields.Selection([
+        ('csv', 'CSV'),
+        ('camt', 'CAMT.053 XML'),
+    ], string='Format', compute='_compute_file_format', store=True, readonly=False)
+    state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+    line_count = fields.Integer(string='Statement Lines', readonly=True)
+    matched_count = fields.Integer(string='Bills Paid', readonly=True)
+    unmatched_count = fields.Integer(string='Unmatched Lines', readonly=True)
+    unmatched_file = fields.Binary(string='Unmatched Lines Report', readonly=True)
+    unmatched_filename = fields.Char(readonly=True)
+
+    @api.depends('filename')
+    def _compute_file_format(self):
+        for rec in self:
+            rec.file_format = 'camt' if (rec.filename or '').lower().endswith('.xml') else 'csv'
+
+    def _open_statement(self):
+        """Binary file object on the uploaded statement, read from the filestore when possible"""
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'statement_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(base64.b64decode(self.with_context(bin_size=False).statement_file))
+
+    def _iter_csv_lines(self, fileobj):
+        reader = csv.reader(codecs.getreader('utf-8-sig')(fileobj))
+        header = [column.strip().lower() for column in next(reader, [])]
+        reference_columns = [index for index, column in enumerate(header) if column in CSV_REFERENCE_COLUMNS]
+        amount_column = next((index for index, column in enumerate(header) if column in CSV_AMOUNT_COLUMNS), None)
+        if not reference_columns or amount_column is None:
+            raise ValidationError(_("The CSV file needs a reference and an amount column."))
+        for line_number, row in enumerate(reader, start=2):
+            if not any(row):
+                continue
+            yield line_number, ' '.join(row[index] for index in reference_columns if index < len(row)), \
+                row[amount_column] if amount_column < len(row) else ''
+
+    def _iter_camt_lines(self, fileobj):
+        """Credit entries of a CAMT.053 statement, one per transaction, parsed element by element"""
+        line_number = 0
+        # The file is user supplied: no entity expansion, DTD or network access
+        entries = etree.iterparse(
+            fileobj, events=('end',), tag='{*}Ntry',
+            resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False,
+        )
+        for _event, entry in entries:
+            try:
+                children = {_local_name(child): child for child in entry}
+                if children.get('CdtDbtInd') is not None and children['CdtDbtInd'].text != 'CRDT':
+                    continue
+                transactions = [node for node in entry.iter('{*}TxDtls')] or [entry]
+                for transaction in transactions:
+                    line_number += 1
+                    amount = transaction.find('{*}Amt')
+                    if amount is None:
+                        amount = transaction.find('.//{*}AmtDtls//{*}Amt')
+                    if amount is None:
+                        amount = children.get('Amt')
+                    references = [node.text for node in transaction.iter('{*}Ustrd', '{*}Ref', '{*}EndToEndId') if node.text]
+                    yield line_number, ' '.join(references), amount.text if amount is not None else ''
+            finally:
+                # Drop the parsed entry and its predecessors to keep memory constant
+                entry.clear()
+                while entry.getprevious() is not None:
+                    del entry.getparent()[0]
+
+    def _build_reference_index(self):
+        """{reference: (bill id, accepted amounts in cents)} of every unpaid bill"""
+        self.env['hospital.bill'].flush_model(['reference', 'state', 'total_amount', 'patient_payable'])
+        self.env.cr.execute("""
+            SELECT reference, id, total_amount, patient_payable
+              FROM hospital_bill
+             WHERE state = 'draft'
+        """)
+        return {
+            reference: (bill_id, {_to_cents(total_amount or 0.0), _to_cents(patient_payable or 0.0)})
+            for reference, bill_id, total_amount, patient_payable in self.env.cr.fetchall()
+        }
+
+    def _pay_bills(self, payments):
+        """Mark bills paid by bank transfer with one untracked write, then log a note on each"""
+        bills = self.env['hospital.bill'].browse(list(payments))
+        bills.with_context(tracking_disable=True).write({'state': 'paid', 'payment_method': 'bank_transfer'})
+        bills._message_log_batch(bodies={
+            bill_id: _("Paid by bank transfer (%s, line %s).") % (self.filename or _('bank statement'), line_number)
+            for bill_id, line_number in payments.items()
+        })
+        bills.invalidate_recordset()
+
+    def action_import(self):
+        """Match the statement lines to unpaid bills by reference and amount, and mark them paid"""
+        self.ensure_one()
+        self.env['hospital.bill'].check_access_rights('write')
+        index = self._build_reference_index()
+        unmatched = io.StringIO()
+        unmatched_writer = csv.writer(unmatched)
+        unmatched_writer.writerow(['Line', 'Reference', 'Amount', 'Reason'])
+        line_count = matched_count = unmatched_count = 0
+        payments = {}
+
+        with self._open_statement() as fileobj:
+            lines = self._iter_camt_lines(fileobj) if self.file_format == 'camt' else self._iter_csv_lines(fileobj)
+            try:
+                for line_number, text, raw_amount in lines:
+                    line_count += 1
+                    try:
+                        cents = _to_cents(_parse_amount(raw_amount))
+                    except (TypeError, ValueError):
+                        cents, reason = None, _('Invalid amount')
+                    else:
+                        reason = _('Unknown or already paid reference')
+                    bill_id = False
+                    if cents is not None:
+                        for token in REFERENCE_TOKEN.findall(text):
+                            if token in index:
+                                if cents in index[token][1]:
+                                    bill_id = index.pop(token)[0]
+                                    break
+                                reason = _('Amount does not match bill %s') % token
+                    if not bill_id:
+                        unmatched_count += 1
+                        unmatched_writer.writerow([line_number, text, raw_amount, reason])
+                        continue
+                    matched_count += 1
+                    payments[bill_id] = line_number
+                    if len(payments) >= PAYMENT_BATCH_SIZE:
+                        self._pay_bills(payments)
+                        payments = {}
+            except (etree.XMLSyntaxError, csv.Error, UnicodeDecodeError) as e:
+                raise ValidationError(_("The statement file could not be read: %s") % e)
+        if payments:
+            self._pay_bills(payments)
+
+        _logger.info(f"Bank statement {self.filename}: {matched_count} bills paid, {unmatched_count} unmatched lines")
+        self.write({
+            'state': 'done',
+            'line_count': line_count,
+            'matched_count': matched_count,
+            'unmatched_count': unmatched_count,
+            'unmatched_file': base64.b64encode(unmatched.getvalue().encode()) if unmatched_count else False,
+            'unmatched_filename': 'unmatched_%s.csv' % (self.filename or 'statement').rsplit('.', 1)[0],
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
@@ -1,10 +1,15 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from psycopg2.errors import LockNotAvailable
+import time
+
+# Attempts to lock beds held by another transaction before giving up
+BED_LOCK_RETRIES = 3
 
 class HospitalBed(models.Model):
     _name = "hospital.bed"
     _description = "Hospital Bed"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hospital.kpi.cache.mixin']
 
     name = fields.Char(string='Bed Name', required=True, tracking=True)
     room_id = fields.Many2one('hospital.room', string='Room', tracking=True)
@@ -31,3 +36,27 @@ class HospitalBed(models.Model):
         for rec in self:
             active_admission = rec.admission_ids.filtered(lambda a: a.state == 'active')
             rec.current_patient_id = active_admission[0].patient_id if active_admission else False
+
+    def _lock_for_allocation(self):
+        """Row-lock the beds (in id order, to avoid deadlocks) and reload their state.
+
+        A bed locked by another desk is retried a few times. A concurrent
+        update that already committed raises a serialization failure, for
+        which the request is replayed by the framework.
+        """
+        if not self:
+            return
+        self.flush_recordset()
+        for attempt in range(BED_LOCK_RETRIES):
+            try:
+                with self.env.cr.savepoint(flush=False):
+                    self.env.cr.execute(
+                        "SELECT id FROM hospital_bed WHERE id IN %s ORDER BY id FOR UPDATE NOWAIT",
+                        [tuple(self.ids)],
+                    )
+                break
+            except LockNotAvailable:
+                if attempt == BED_LOCK_RETRIES - 1:
+                    raise ValidationError(_("These beds are being allocated at another desk, please try again."))
+                time.sleep(0.1 * 2 ** attempt)
+        self.invalidate_recordset(['state'])
@@ -1,8 +1,18 @@
 from odoo import api, fields, models, _
+from odoo.tools import split_every
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Discharged admissions are still billed for this many days after leaving
+ROOM_CHARGE_LOOKBACK_DAYS = 7
+
+BILL_RECOMPUTE_BATCH = 1000
 
 class HospitalBill(models.Model):
     _name = "hospital.bill"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hospital.kpi.cache.mixin']
     _description = "Hospital Bill"
     _rec_name = "reference"
     _order = "date_bill desc"
@@ -11,14 +21,14 @@ class HospitalBill(models.Model):
     patient_id = fields.Many2one('hospital.patient', string="Patient", required=True, tracking=True)
     admission_id = fields.Many2one('hospital.admission', string="Related Admission", tracking=True)
     appointment_id = fields.Many2one('hospital.appointment', string="Related Appointment", tracking=True)
-    date_bill = fields.Date(string='Date', default=fields.Date.today, required=True, tracking=True)
+    date_bill = fields.Date(string='Date', default=fields.Date.today, required=True, index=True, tracking=True)
     due_date = fields.Date(string='Due Date', tracking=True)
     bill_line_ids = fields.One2many('hospital.bill.line', 'bill_id', string='Bill Lines')
     subtotal = fields.Float(string='Subtotal', compute='_compute_amounts', store=True)
     tax_amount = fields.Float(string='Tax Amount', compute='_compute_amounts', store=True)
     total_amount = fields.Float(string='Total Amount', compute='_compute_amounts', store=True, tracking=True)
     amount = fields.Float(string="Amount", compute='_compute_amounts', store=True, tracking=True)  # Keep for compatibility
-    insurance_id = fields.Many2one('hospital.insurance', string='Insurance Policy', domain="[('patient_id', '=', patient_id), ('is_active', '=', True)]")
+    insurance_id = fields.Many2one('hospital.insurance', string='Insurance Policy', index='btree_not_null', domain="[('patient_id', '=', patient_id), ('is_active', '=', True)]")
     insurance_coverage = fields.Float(string='Insurance Coverage', compute='_compute_insurance_coverage', store=True)
     patient_payable = fields.Float(string='Patient Payable', compute='_compute_insurance_coverage', store=True)
     payment_method = fields.Selection([
@@ -34,11 +44,12 @@ class HospitalBill(models.Model):
         ('cancel', 'Cancelled'),
     ], string='Status', default='draft', required=True, tracking=True)
 
-    @api.model
-    def create(self, vals):
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code('hospital.bill') or _('New')
-        return super(HospitalBill, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('reference', _('New')) == _('New'):
+                vals['reference'] = self.env['ir.sequence'].next_by_code('hospital.bill') or _('New')
+        return super(HospitalBill, self).create(vals_list)
 
     def action_paid(self):
         for rec in self:
@@ -50,8 +61,12 @@ class HospitalBill(models.Model):
 
     @api.depends('bill_line_ids.subtotal')
     def _compute_amounts(self):
+        # Saved bills are summed with one grouped query, bills being edited in a form in memory
+        saved = self.filtered(lambda b: isinstance(b.id, int))
+        totals = dict(self.env['hospital.bill.line']._read_group(
+            [('bill_id', 'in', saved.ids)], groupby=['bill_id'], aggregates=['subtotal:sum'])) if saved else {}
         for rec in self:
-            subtotal = sum(rec.bill_line_ids.mapped('subtotal'))
+            subtotal = (totals.get(rec, 0.0) or 0.0) if rec in saved else sum(rec.bill_line_ids.mapped('subtotal'))
             rec.subtotal = subtotal
             rec.tax_amount = subtotal * 0.0  # No tax for now, can be customized
             rec.total_amount = subtotal + rec.tax_amount
@@ -68,6 +83,92 @@ class HospitalBill(models.Model):
                 rec.insurance_coverage = 0.0
                 rec.patient_payable = rec.total_amount
 
+    def _recompute_amounts(self):
+        """Recompute line subtotals, totals, coverage and payable amounts of these bills"""
+        lines = self.env['hospital.bill.line'].search([('bill_id', 'in', self.ids)])
+        self.env.add_to_compute(lines._fields['subtotal'], lines)
+        for fname in ('subtotal', 'tax_amount', 'total_amount', 'amount', 'insurance_coverage', 'patient_payable'):
+            self.env.add_to_compute(self._fields[fname], self)
+        self.env.flush_all()
+
+    @api.model
+    def recompute_all_amounts(self, batch_size=BILL_RECOMPUTE_BATCH):
+        """Repair command recomputing the amounts of every bill, batch by batch (e.g. after a migration)"""
+        bill_ids = self.search([], order='id').ids
+        for batch_ids in split_every(batch_size, bill_ids):
+            self.browse(batch_ids)._recompute_amounts()
+            self.env.invalidate_all()
+        _logger.info(f"Recomputed the amounts of {len(bill_ids)} bills")
+        return len(bill_ids)
+
+    @api.model
+    def generate_room_charges(self, billing_date=None):
+        """Bill one room charge line per admission and day, up to the day before billing_date.
+
+        Covers active admissions and those discharged in the last
+        ROOM_CHARGE_LOOKBACK_DAYS days, at the daily rate of their bed's room.
+        Days already charged are skipped, so the run can be repeated safely.
+        Lines go to the admission's draft bill, created if needed.
+        """
+        billing_date = billing_date or fields.Date.today()
+        admissions = self.env['hospital.admission'].search([
+            ('bed_id.room_id.daily_rate', '>', 0),
+            '|', ('state', '=', 'active'),
+            '&', ('state', '=', 'discharged'), ('discharge_date', '>=', billing_date - timedelta(days=ROOM_CHARGE_LOOKBACK_DAYS)),
+        ])
+        if not admissions:
+            return self.env['hospital.bill.line']
+
+        BillLine = self.env['hospital.bill.line']
+        last_charged = dict(BillLine._read_group(
+            [('admission_id', 'in', admissions.ids), ('charge_date', '!=', False)],
+            groupby=['admission_id'], aggregates=['charge_date:max']))
+        draft_bills = {admission: bills.sorted('id', reverse=True)[:1] for admission, bills in self._read_group(
+            [('admission_id', 'in', admissions.ids), ('state', '=', 'draft')],
+            groupby=['admission_id'], aggregates=['id:recordset'])}
+
+        # Days to charge per admission: from the day after the last charge (or the
+        # admission day) to the discharge day excluded, or to billing_date excluded
+        charges = []
+        for admission in admissions:
+            start = admission.date_admission.date()
+            if admission in last_charged:
+                start = max(start, last_charged[admission] + timedelta(days=1))
+            if admission.state == 'discharged':
+                end = max(admission.discharge_date.date(), admission.date_admission.date() + timedelta(days=1))
+            else:
+                end = billing_date
+            days = (end - start).days
+            if days > 0:
+                charges.append((admission, [start + timedelta(days=offset) for offset in range(days)]))
+        if not charges:
+            return BillLine
+
+        missing = [admission for admission, _days in charges if admission not in draft_bills]
+        new_bills = self.create([{
+            'patient_id': admission.patient_id.id,
+            'admission_id': admission.id,
+            'date_bill': billing_date,
+        } for admission in missing])
+        draft_bills.update(zip(missing, new_bills))
+
+        lines = BillLine.create([{
+            'bill_id': draft_bills[admission].id,
+            'admission_id': admission.id,
+            'charge_date': day,
+            'product_type': 'room',
+            'description': _("Room %s - %s") % (admission.bed_id.room_id.name, day),
+            'quantity': 1.0,
+            'unit_price': admission.bed_id.room_id.daily_rate,
+        } for admission, days in charges for day in days])
+        _logger.info(f"Room charges: {len(lines)} days billed for {len(charges)} admissions")
+        return lines
+
+    @api.model
+    def _cron_generate_room_charges(self):
+        """Nightly cron job billing room charges up to yesterday"""
+        self.generate_room_charges()
+
 
 class HospitalBillLine(models.Model):
     _name = "hospital.bill.line"
@@ -87,6 +188,12 @@ class HospitalBillLine(models.Model):
     quantity = fields.Float(string='Quantity', default=1.0, required=True)
     unit_price = fields.Float(string='Unit Price', required=True)
     subtotal = fields.Float(string='Subtotal', compute='_compute_subtotal', store=True)
+    admission_id = fields.Many2one('hospital.admission', string='Admission', index=True, readonly=True)
+    charge_date = fields.Date(string='Charged Day', index=True, readonly=True)
+
+    _sql_constraints = [
+        ('unique_room_charge', 'unique(admission_id, charge_date)', 'A day of stay can only be charged once per admission!')
+    ]
 
     @api.depends('quantity', 'unit_price')
     def _compute_subtotal(self):
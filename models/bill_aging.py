@@ -0,0 +1,96 @@
+from odoo import api, fields, models, tools, _
+
+AGING_BUCKETS = [
+    ('not_due', 'Not Due'),
+    ('0_30', '0-30 Days'),
+    ('31_60', '31-60 Days'),
+    ('61_90', '61-90 Days'),
+    ('90_plus', '90+ Days'),
+]
+
+class HospitalBillAging(models.Model):
+    _name = "hospital.bill.aging"
+    _description = "Accounts Receivable Aging"
+    _auto = False
+    _rec_name = "bill_id"
+    _order = "days_overdue desc"
+
+    bill_id = fields.Many2one('hospital.bill', string='Bill', readonly=True)
+    patient_id = fields.Many2one('hospital.patient', string='Patient', readonly=True)
+    insurance_id = fields.Many2one('hospital.insurance', string='Insurance Policy', readonly=True)
+    provider_id = fields.Many2one('hospital.insurance.provider', string='Insurer', readonly=True)
+    payment_method = fields.Selection([
+        ('cash', 'Cash'),
+        ('card', 'Credit/Debit Card'),
+        ('insurance', 'Insurance'),
+        ('bank_transfer', 'Bank Transfer'),
+    ], string='Payment Method', readonly=True)
+    date_bill = fields.Date(string='Bill Date', readonly=True)
+    due_date = fields.Date(string='Due Date', readonly=True)
+    days_overdue = fields.Integer(string='Days Overdue', readonly=True, group_operator='max')
+    aging_bucket = fields.Selection(AGING_BUCKETS, string='Aging', readonly=True)
+    amount_due = fields.Float(string='Amount Due', readonly=True)
+    insurer_due = fields.Float(string='Insurer Due', readonly=True)
+    patient_due = fields.Float(string='Patient Due', readonly=True)
+    amount_not_due = fields.Float(string='Not Due', readonly=True)
+    amount_0_30 = fields.Float(string='0-30 Days', readonly=True)
+    amount_31_60 = fields.Float(string='31-60 Days', readonly=True)
+    amount_61_90 = fields.Float(string='61-90 Days', readonly=True)
+    amount_90_plus = fields.Float(string='90+ Days', readonly=True)
+
+    def init(self):
+        """Unpaid bills aged against their due date (or bill date when it is missing) as of today"""
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %s AS (
+                SELECT id, bill_id, patient_id, insurance_id, provider_id, payment_method,
+                       date_bill, due_date, days_overdue, aging_bucket,
+                       amount_due, insurer_due, patient_due,
+                       CASE WHEN aging_bucket = 'not_due' THEN amount_due ELSE 0 END AS amount_not_due,
+                       CASE WHEN aging_bucket = '0_30' THEN amount_due ELSE 0 END AS amount_0_30,
+                       CASE WHEN aging_bucket = '31_60' THEN amount_due ELSE 0 END AS amount_31_60,
+                       CASE WHEN aging_bucket = '61_90' THEN amount_due ELSE 0 END AS amount_61_90,
+                       CASE WHEN aging_bucket = '90_plus' THEN amount_due ELSE 0 END AS amount_90_plus
+                  FROM (
+                    SELECT bill.id, bill.id AS bill_id, bill.patient_id, bill.insurance_id,
+                           insurance.provider_id, bill.payment_method, bill.date_bill, bill.due_date,
+                           CURRENT_DATE - COALESCE(bill.due_date, bill.date_bill) AS days_overdue,
+                           CASE
+                               WHEN CURRENT_DATE - COALESCE(bill.due_date, bill.date_bill) < 0 THEN 'not_due'
+                               WHEN CURRENT_DATE - COALESCE(bill.due_date, bill.date_bill) <= 30 THEN '0_30'
+                               WHEN CURRENT_DATE - COALESCE(bill.due_date, bill.date_bill) <= 60 THEN '31_60'
+                               WHEN CURRENT_DATE - COALESCE(bill.due_date, bill.date_bill) <= 90 THEN '61_90'
+                               ELSE '90_plus'
+                           END AS aging_bucket,
+                           COALESCE(bill.total_amount, 0) AS amount_due,
+                           COALESCE(bill.insurance_coverage, 0) AS insurer_due,
+                           COALESCE(bill.patient_payable, bill.total_amount, 0) AS patient_due
+                      FROM hospital_bill bill
+                 LEFT JOIN hospital_insurance insurance ON insurance.id = bill.insurance_id
+                     WHERE bill.state = 'draft'
+                       AND COALESCE(bill.total_amount, 0) > 0
+                ) aged
+            )
+        """ % self._table)
+
+    @api.model
+    def get_aging_summary(self, groupby='patient_id'):
+        """Return the aging buckets per patient, insurer or payment method, largest balance first"""
+        if groupby not in ('patient_id', 'provider_id', 'payment_method'):
+            groupby = 'patient_id'
+        aggregates = ['amount_due:sum'] + ['amount_%s:sum' % bucket for bucket, _label in AGING_BUCKETS]
+        rows = self._read_group([], groupby=[groupby], aggregates=aggregates, order='amount_due:sum desc')
+        payment_methods = dict(self._fields['payment_method']._description_selection(self.env))
+        summary = []
+        for key, amount_due, *buckets in rows:
+            if groupby == 'payment_method':
+                key, label = key, payment_methods.get(key)
+            else:
+                key, label = key.id, key.display_name
+            summary.append(dict(
+                zip(['amount_%s' % bucket for bucket, _label in AGING_BUCKETS], buckets),
+                key=key,
+                label=label or _('Undefined'),
+                amount_due=amount_due,
+            ))
+        return summary
@@ -1,6 +1,15 @@
 from odoo import api, fields, models, _
 from datetime import datetime, timedelta
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
+from odoo.exceptions import ValidationError
+from dateutil.relativedelta import relativedelta
+from .kpi_cache import kpi_cache
+
+REVENUE_GRANULARITIES = {
+    'day': '%d %b %Y',
+    'week': 'Week of %d %b %Y',
+    'month': '%B %Y',
+}
 
 class HospitalDashboard(models.TransientModel):
     _name = 'hospital.dashboard'
@@ -26,85 +35,65 @@ class HospitalDashboard(models.TransientModel):
 
     @api.depends('date_from', 'date_to')
     def _compute_statistics(self):
+        dbname = self.env.cr.dbname
+        ttl = self.env['hospital.kpi.cache.mixin']._get_kpi_cache_ttl()
+        today = fields.Date.today()
+        # Point-in-time KPIs, read from today's snapshot row after a relevant change or TTL expiry
+        snapshot = kpi_cache.get((dbname, 'today', today), lambda: self._get_today_kpis(ttl), ttl)
         for rec in self:
-            # Total active patients
-            rec.total_patients = self.env['hospital.patient'].search_count([('active', '=', True)])
-            
-            # Total active doctors
-            rec.total_doctors = self.env['hospital.doctor'].search_count([('active', '=', True)])
-            
-            # Today's appointments
-            today = fields.Date.today()
-            rec.total_appointments_today = self.env['hospital.appointment'].search_count([
-                ('date_appointment', '>=', today),
-                ('date_appointment', '<', today + timedelta(days=1)),
-                ('state', '!=', 'cancel')
-            ])
-            
-            # Active admissions
-            rec.total_admissions_active = self.env['hospital.admission'].search_count([
-                ('state', '=', 'active')
-            ])
-            
-            # Monthly revenue from paid bills
-            first_day_month = today.replace(day=1)
-            bills = self.env['hospital.bill'].search([
-                ('date_bill', '>=', first_day_month),
-                ('date_bill', '<=', today),
-                ('state', '=', 'paid')
-            ])
-            rec.total_revenue_month = sum(bills.mapped('total_amount'))
-            
-            # Pending bills
-            rec.total_pending_bills = self.env['hospital.bill'].search_count([
-                ('state', '=', 'draft')
-            ])
-            
-            # Bed occupancy rate
-            total_beds = self.env['hospital.bed'].search_count([('active', '=', True)])
-            occupied_beds = self.env['hospital.bed'].search_count([
-                ('active', '=', True),
-                ('state', '=', 'occupied')
-            ])
-            rec.bed_occupancy_rate = (occupied_beds / total_beds * 100) if total_beds > 0 else 0
+            rec.total_patients = int(snapshot.get('total_patients', 0))
+            rec.total_doctors = int(snapshot.get('total_doctors', 0))
+            rec.total_appointments_today = int(snapshot.get('total_appointments_today', 0))
+            rec.total_admissions_active = int(snapshot.get('total_admissions_active', 0))
+            rec.total_revenue_month = snapshot.get('total_revenue_month', 0.0)
+            rec.total_pending_bills = int(snapshot.get('total_pending_bills', 0))
+            rec.bed_occupancy_rate = snapshot.get('bed_occupancy_rate', 0.0)
+            rec.patient_growth_rate = snapshot.get('patient_growth_rate', 0.0)
             
-            # Patient growth rate (last 30 days vs previous 30 days)
-            thirty_days_ago = today - timedelta(days=30)
-            sixty_days_ago = today - timedelta(days=60)
-            
-            recent_patients = self.env['hospital.patient'].search_count([
-                ('create_date', '>=', thirty_days_ago),
-                ('create_date', '<=', today)
-            ])
-            previous_patients = self.env['hospital.patient'].search_count([
-                ('create_date', '>=', sixty_days_ago),
-                ('create_date', '<', thirty_days_ago)
-            ])
-            
-            if previous_patients > 0:
-                rec.patient_growth_rate = ((recent_patients - previous_patients) / previous_patients) * 100
-            else:
-                rec.patient_growth_rate = 100.0 if recent_patients > 0 else 0.0
-            
-            # Appointment completion rate
-            total_appointments = self.env['hospital.appointment'].search_count([
-                ('date_appointment', '>=', rec.date_from),
-                ('date_appointment', '<=', rec.date_to)
-            ])
-            completed_appointments = self.env['hospital.appointment'].search_count([
-                ('date_appointment', '>=', rec.date_from),
-                ('date_appointment', '<=', rec.date_to),
-                ('state', '=', 'done')
-            ])
-            rec.appointment_completion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
-            
-            # Average bill amount
-            all_bills = self.env['hospital.bill'].search([
-                ('date_bill', '>=', rec.date_from),
-                ('date_bill', '<=', rec.date_to),
-                ('state', '=', 'paid')
-            ])
-            rec.average_bill_amount = sum(all_bills.mapped('total_amount')) / len(all_bills) if all_bills else 0
+            range_kpis = kpi_cache.get(
+                (dbname, 'range', rec.date_from, rec.date_to),
+                lambda: rec._compute_range_kpis(rec.date_from, rec.date_to),
+                ttl,
+            )
+            rec.appointment_completion_rate = range_kpis['appointment_completion_rate']
+            rec.average_bill_amount = range_kpis['average_bill_amount']
+
+    @api.model
+    def _get_today_kpis(self, max_age):
+        """Today's snapshot values, refreshed first if this worker changed the underlying
+        data or if the row is older than max_age seconds"""
+        Snapshot = self.env['hospital.kpi.snapshot'].sudo()
+        if kpi_cache.pop_stale(self.env.cr.dbname):
+            return Snapshot._update_snapshot()
+        return Snapshot.get_snapshot_values(max_age=max_age)
+
+    @api.model
+    def _compute_range_kpis(self, date_from, date_to):
+        """Compute the KPIs that depend on the selected date range"""
+        # Appointment completion rate
+        appointments = dict(self.env['hospital.appointment']._read_group([
+            ('date_appointment', '>=', date_from),
+            ('date_appointment', '<=', date_to)
+        ], groupby=['state'], aggregates=['__count']))
+        total_appointments = sum(appointments.values())
+        completed_appointments = appointments.get('done', 0)
+        
+        # Average bill amount
+        [[bill_count, bill_total]] = self.env['hospital.bill']._read_group([
+            ('date_bill', '>=', date_from),
+            ('date_bill', '<=', date_to),
+            ('state', '=', 'paid')
+        ], aggregates=['__count', 'total_amount:sum'])
+        
+        return {
+            'appointment_completion_rate': (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0,
+            'average_bill_amount': (bill_total or 0.0) / bill_count if bill_count else 0,
+        }
+
+    @api.model
+    def get_kpi_cache_stats(self):
+        """Return hit/miss counters of the in-process KPI cache"""
+        return kpi_cache.stats()
 
     def get_appointment_chart_data(self):
         """Get data for appointment status pie chart"""
@@ -121,60 +110,95 @@ class HospitalDashboard(models.TransientModel):
         
         return data
 
-    def get_revenue_chart_data(self):
-        """Get monthly revenue data for the last 6 months"""
+    def get_revenue_chart_data(self, date_from=None, date_to=None, granularity='month'):
+        """Get paid revenue per day/week/month, defaulting to the last 6 months.
+
+        Periods without any paid bill are included with a revenue of 0.
+        """
         self.ensure_one()
-        result = []
+        if granularity not in REVENUE_GRANULARITIES:
+            raise ValidationError(_("Unsupported granularity '%s'.") % granularity)
         today = fields.Date.today()
+        date_to = fields.Date.to_date(date_to) or today
+        date_from = fields.Date.to_date(date_from) or (today.replace(day=1) - relativedelta(months=5))
         
-        for i in range(5, -1, -1):
-            month_date = today - timedelta(days=30 * i)
-            first_day = month_date.replace(day=1)
-            
-            # Calculate last day of month
-            if month_date.month == 12:
-                last_day = month_date.replace(day=31)
-            else:
-                last_day = (month_date.replace(month=month_date.month + 1, day=1) - timedelta(days=1))
-            
-            bills = self.env['hospital.bill'].search([
-                ('date_bill', '>=', first_day),
-                ('date_bill', '<=', last_day),
-                ('state', '=', 'paid')
-            ])
-            
-            revenue = sum(bills.mapped('total_amount'))
-            result.append({
-                'month': month_date.strftime('%B %Y'),
-                'revenue': revenue
-            })
+        self.env['hospital.bill'].flush_model(['date_bill', 'state', 'total_amount'])
+        self.env.cr.execute("""
+            WITH revenue AS (
+                SELECT date_trunc(%(granularity)s, date_bill::timestamp) AS period,
+                       SUM(total_amount) AS total
+                  FROM hospital_bill
+                 WHERE state = 'paid'
+                   AND date_bill >= %(date_from)s
+                   AND date_bill <= %(date_to)s
+              GROUP BY period
+            )
+            SELECT series.period::date, COALESCE(revenue.total, 0)
+              FROM generate_series(
+                       date_trunc(%(granularity)s, %(date_from)s::timestamp),
+                       date_trunc(%(granularity)s, %(date_to)s::timestamp),
+                       ('1 ' || %(granularity)s)::interval
+                   ) AS series(period)
+         LEFT JOIN revenue ON revenue.period = series.period
+          ORDER BY series.period
+        """, {'granularity': granularity, 'date_from': date_from, 'date_to': date_to})
         
-        return result
+        label_format = REVENUE_GRANULARITIES[granularity]
+        return [{
+            'month': period.strftime(label_format),
+            'date': fields.Date.to_string(period),
+            'revenue': revenue,
+        } for period, revenue in self.env.cr.fetchall()]
+
+    def get_department_patient_distribution(self, include_patients=False):
+        """Get appointment distribution by department (through the doctor).
 
-    def get_department_patient_distribution(self):
-        """Get patient distribution by department"""
+        Appointments of doctors without a department are reported in an
+        extra 'Unassigned' bucket. With include_patients, each bucket also
+        carries the number of distinct patients seen.
+        """
         self.ensure_one()
-        departments = self.env['hospital.department'].search([('active', '=', True)])
-        result = []
+        self.env['hospital.appointment'].flush_model(['doctor_id', 'patient_id', 'date_appointment'])
+        self.env['hospital.doctor'].flush_model(['department_id'])
+        self.env['hospital.department'].flush_model(['name', 'active'])
+        self.env.cr.execute("""
+            WITH counts AS (
+                SELECT doc.department_id,
+                       COUNT(*) AS appointments,
+                       COUNT(DISTINCT apt.patient_id) AS patients
+                  FROM hospital_appointment apt
+                  JOIN hospital_doctor doc ON doc.id = apt.doctor_id
+                 WHERE apt.date_appointment >= %(date_from)s
+                   AND apt.date_appointment <= %(date_to)s
+              GROUP BY doc.department_id
+            )
+            SELECT dept.id, dept.name, COALESCE(counts.appointments, 0), COALESCE(counts.patients, 0)
+              FROM hospital_department dept
+         LEFT JOIN counts ON counts.department_id = dept.id
+             WHERE dept.active
+             UNION ALL
+            SELECT NULL, NULL, counts.appointments, counts.patients
+              FROM counts
+             WHERE counts.department_id IS NULL
+          ORDER BY 1 NULLS LAST
+        """, {'date_from': self.date_from, 'date_to': self.date_to})
         
-        for dept in departments:
-            # Count appointments in this department through doctors
-            doctors = self.env['hospital.doctor'].search([('department_id', '=', dept.id)])
-            appointment_count = self.env['hospital.appointment'].search_count([
-                ('doctor_id', 'in', doctors.ids),
-                ('date_appointment', '>=', self.date_from),
-                ('date_appointment', '<=', self.date_to)
-            ])
-            
-            result.append({
-                'department': dept.name,
-                'count': appointment_count
-            })
+        result = []
+        for dept_id, name, count, patients in self.env.cr.fetchall():
+            entry = {
+                'department': name if dept_id else _('Unassigned'),
+                'count': count,
+            }
+            if include_patients:
+                entry['patients'] = patients
+            result.append(entry)
         
         return result
 
     def action_refresh_dashboard(self):
         """Refresh dashboard data"""
+        kpi_cache.invalidate(self.env.cr.dbname)
+        self.env['hospital.kpi.snapshot'].sudo()._update_snapshot()
         self._compute_statistics()
         return {
             'type': 'ir.actions.client',
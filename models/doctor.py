@@ -1,8 +1,16 @@
 from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
+from datetime import datetime, time, timedelta
+import hashlib
+import pytz
+import uuid
+
+# Past appointments kept in a full calendar feed
+CALENDAR_FEED_DAYS_BACK = 90
 
 class HospitalDoctor(models.Model):
     _name = "hospital.doctor"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hospital.kpi.cache.mixin']
     _description = "Doctor Record"
     _rec_name = "name"
 
@@ -23,6 +31,9 @@ class HospitalDoctor(models.Model):
     appointment_ids = fields.One2many('hospital.appointment', 'doctor_id', string='Appointments')
     prescription_ids = fields.One2many('hospital.prescription', 'doctor_id', string='Prescriptions')
     
+    calendar_token = fields.Char(string='Calendar Token', copy=False, groups='gestion_hospitaliere.group_hospital_manager')
+    calendar_feed_url = fields.Char(string='Calendar Feed URL', compute='_compute_calendar_feed_url', groups='gestion_hospitaliere.group_hospital_manager')
+    
     # Computed fields
     appointment_count = fields.Integer(string='Appointments', compute='_compute_appointment_count')
 
@@ -31,6 +42,98 @@ class HospitalDoctor(models.Model):
         for rec in self:
             rec.appointment_count = len(rec.appointment_ids)
 
+    @api.depends('calendar_token')
+    def _compute_calendar_feed_url(self):
+        base_url = self.get_base_url()
+        for rec in self:
+            if rec.calendar_token:
+                rec.calendar_feed_url = '%s/hospital/calendar/%s/%s/appointments.ics' % (base_url, rec.id, rec.calendar_token)
+            else:
+                rec.calendar_feed_url = False
+
+    def action_generate_calendar_token(self):
+        for rec in self:
+            rec.calendar_token = uuid.uuid4().hex
+
+    def _calendar_feed_domain(self, since=None):
+        self.ensure_one()
+        domain = [('doctor_id', '=', self.id)]
+        if since:
+            domain.append(('write_date', '>', since))
+        else:
+            domain += [
+                ('state', '!=', 'cancel'),
+                ('date_appointment', '>=', fields.Datetime.now() - timedelta(days=CALENDAR_FEED_DAYS_BACK)),
+            ]
+        return domain
+
+    def _get_calendar_feed_etag(self, since=None):
+        """Cheap fingerprint of the feed content: one aggregate query, no rendering"""
+        self.ensure_one()
+        [[count, last_write]] = self.env['hospital.appointment'].sudo()._read_group(
+            self._calendar_feed_domain(since), aggregates=['__count', 'write_date:max'],
+        )
+        key = '%s-%s-%s-%s' % (self.id, count, last_write, since)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _render_calendar_feed(self, since=None):
+        """Render the doctor's appointments as an iCalendar document.
+
+        With since, only appointments modified after that datetime are
+        included, cancelled ones flagged STATUS:CANCELLED so clients drop them.
+        """
+        self.ensure_one()
+        Appointment = self.env['hospital.appointment'].sudo()
+        type_labels = dict(Appointment._fields['appointment_type']._description_selection(self.env))
+        dbname = self.env.cr.dbname
+
+        def ics_datetime(value):
+            return value.strftime('%Y%m%dT%H%M%SZ')
+
+        def ics_text(value):
+            return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//Gestion Hospitaliere//Appointments//EN',
+            'CALSCALE:GREGORIAN',
+            'X-WR-CALNAME:%s' % ics_text(self.name),
+        ]
+        for apt in Appointment.search_read(self._calendar_feed_domain(since), [
+            'reference', 'patient_id', 'appointment_type', 'date_appointment', 'date_end', 'state', 'note', 'write_date',
+        ], order='date_appointment asc'):
+            lines += [
+                'BEGIN:VEVENT',
+                'UID:appointment-%s@%s' % (apt['id'], dbname),
+                'DTSTAMP:%s' % ics_datetime(apt['write_date']),
+                'LAST-MODIFIED:%s' % ics_datetime(apt['write_date']),
+                'DTSTART:%s' % ics_datetime(apt['date_appointment']),
+                'DTEND:%s' % ics_datetime(apt['date_end'] or apt['date_appointment']),
+                'SUMMARY:%s' % ics_text('%s - %s' % (type_labels.get(apt['appointment_type'], ''), apt['patient_id'][1] if apt['patient_id'] else '')),
+                'DESCRIPTION:%s' % ics_text('%s\n%s' % (apt['reference'], apt['note'] or '')),
+                'STATUS:%s' % ('CANCELLED' if apt['state'] == 'cancel' else 'CONFIRMED' if apt['state'] in ('confirmed', 'done') else 'TENTATIVE'),
+                'END:VEVENT',
+            ]
+        lines.append('END:VCALENDAR')
+        return '\r\n'.join(self._fold_ics_line(line) for line in lines) + '\r\n'
+
+    @staticmethod
+    def _fold_ics_line(line):
+        # RFC 5545: lines longer than 75 octets are folded with CRLF + space
+        if len(line.encode('utf-8')) <= 75:
+            return line
+        parts = []
+        current = ''
+        for char in line:
+            if len((current + char).encode('utf-8')) > 74:
+                parts.append(current)
+                current = char
+            else:
+                current += char
+        parts.append(current)
+        return '\r\n '.join(parts)
+
     def action_view_appointments(self):
         return {
             'type': 'ir.actions.act_window',
@@ -40,3 +143,77 @@ class HospitalDoctor(models.Model):
             'view_mode': 'tree,form,calendar',
             'context': {'default_doctor_id': self.id}
         }
+
+    @api.model
+    def get_free_slots(self, date_from, date_to, slot_length=0.5, doctor_ids=None, department_id=None,
+                       specialization_id=None, work_start=8.0, work_end=18.0, include_weekends=False):
+        """Return the free slots of slot_length hours of each doctor between date_from and date_to.
+
+        Working hours are expressed in the user's timezone. Existing bookings
+        are fetched in one query and the gaps between them are found with a
+        single sweep over each doctor's sorted bookings.
+        """
+        if slot_length <= 0 or work_start >= work_end:
+            raise ValidationError(_("Invalid slot length or working hours."))
+        domain = [('active', '=', True)]
+        if doctor_ids:
+            domain.append(('id', 'in', doctor_ids))
+        if department_id:
+            domain.append(('department_id', '=', department_id))
+        if specialization_id:
+            domain.append(('specialization_ids', 'in', [specialization_id]))
+        doctors = self.search(domain)
+
+        # Working windows in UTC, as stored in the database
+        tz = pytz.timezone(self.env.user.tz or 'UTC')
+        windows = []
+        day = fields.Date.to_date(date_from)
+        while day <= fields.Date.to_date(date_to):
+            if include_weekends or day.weekday() < 5:
+                window = []
+                for hours in (work_start, work_end):
+                    local = tz.localize(datetime.combine(day, time()) + timedelta(hours=hours))
+                    window.append(local.astimezone(pytz.utc).replace(tzinfo=None))
+                windows.append(tuple(window))
+            day += timedelta(days=1)
+        if not doctors or not windows:
+            return []
+
+        bookings = {doctor.id: [] for doctor in doctors}
+        for booking in self.env['hospital.appointment'].search_read([
+            ('doctor_id', 'in', doctors.ids),
+            ('state', '!=', 'cancel'),
+            ('date_appointment', '<', windows[-1][1]),
+            ('date_end', '>', windows[0][0]),
+        ], ['doctor_id', 'date_appointment', 'date_end'], order='date_appointment asc', load=None):
+            bookings[booking['doctor_id']].append((booking['date_appointment'], booking['date_end']))
+
+        length = timedelta(hours=slot_length)
+        result = []
+        for doctor in doctors:
+            slots = []
+            intervals = bookings[doctor.id]
+            index = 0
+            for window_start, window_end in windows:
+                cursor = window_start
+                # Skip bookings that ended before this window
+                while index < len(intervals) and intervals[index][1] <= window_start:
+                    index += 1
+                position = index
+                while cursor + length <= window_end:
+                    if position < len(intervals) and intervals[position][0] < cursor + length:
+                        # The next booking starts before this slot would end
+                        cursor = max(cursor, intervals[position][1])
+                        position += 1
+                        continue
+                    slots.append({
+                        'start': fields.Datetime.to_string(cursor),
+                        'end': fields.Datetime.to_string(cursor + length),
+                    })
+                    cursor += length
+            result.append({
+                'doctor_id': doctor.id,
+                'doctor_name': doctor.name,
+                'slots': slots,
+            })
+        return result
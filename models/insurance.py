@@ -2,6 +2,9 @@
 
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+import logging
+
+_logger = logging.getLogger(__name__)
 
 class HospitalInsurance(models.Model):
     _name = "hospital.insurance"
@@ -13,9 +16,9 @@ class HospitalInsurance(models.Model):
     patient_id = fields.Many2one('hospital.patient', string="Patient", required=True, tracking=True)
     provider_id = fields.Many2one('hospital.insurance.provider', string='Insurance Provider', required=True, tracking=True)
     coverage_percentage = fields.Float(string='Coverage %', default=80.0, tracking=True, help='Percentage of costs covered by insurance')
-    start_date = fields.Date(string='Start Date', required=True, tracking=True)
-    end_date = fields.Date(string='End Date', tracking=True)
-    is_active = fields.Boolean(string='Active', compute='_compute_is_active', store=True)
+    start_date = fields.Date(string='Start Date', required=True, index=True, tracking=True)
+    end_date = fields.Date(string='End Date', index=True, tracking=True)
+    is_active = fields.Boolean(string='Active', compute='_compute_is_active', store=True, index=True)
     max_coverage_amount = fields.Float(string='Max Coverage Amount', help='Maximum amount covered by policy')
     notes = fields.Text(string='Notes')
 
@@ -35,6 +38,30 @@ class HospitalInsurance(models.Model):
             else:
                 rec.is_active = False
 
+    @api.model
+    def _cron_update_active_policies(self):
+        """Daily cron job flipping is_active on the policies whose start or end date
+        was crossed (since the last run), then recomputing the coverage of their draft bills"""
+        today = fields.Date.today()
+        policies = self.search([
+            '|',
+            '&', '&', ('is_active', '=', False), ('start_date', '<=', today),
+            '|', ('end_date', '=', False), ('end_date', '>=', today),
+            '&', ('is_active', '=', True),
+            '|', ('start_date', '>', today), ('end_date', '<', today),
+        ])
+        if not policies:
+            return
+        self.env.add_to_compute(self._fields['is_active'], policies)
+        policies.flush_recordset(['is_active'])
+
+        Bill = self.env['hospital.bill']
+        bills = Bill.search([('insurance_id', 'in', policies.ids), ('state', '=', 'draft')])
+        for fname in ('insurance_coverage', 'patient_payable'):
+            self.env.add_to_compute(Bill._fields[fname], bills)
+        bills.flush_recordset(['insurance_coverage', 'patient_payable'])
+        _logger.info(f"Insurance policies: {len(policies)} policies updated, {len(bills)} draft bills recomputed")
+
     @api.constrains('coverage_percentage')
     def _check_coverage_percentage(self):
         for rec in self:
@@ -0,0 +1,109 @@
+from odoo import api, fields, models, _
+import threading
+import time
+
+DEFAULT_TTL = 300
+
+
+class KpiCache(object):
+    """In-process cache of dashboard KPI values, keyed by database, metric and date range.
+
+    Entries are dropped whenever a bill, appointment, admission or bed is
+    created, written or deleted in this worker. Other workers only notice
+    such a change once their entry expires: the dashboard then rebuilds
+    today's snapshot row if it is older than the TTL, so they serve values
+    at most twice the TTL old. Each
+    database has a generation counter, bumped on invalidation, so a value
+    computed while an invalidation happened is not stored.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+        self._generations = {}
+        self._stale = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute, ttl=DEFAULT_TTL):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generations.get(key[0], 0)
+        value = compute()
+        with self._lock:
+            if self._generations.get(key[0], 0) == generation:
+                self._data[key] = (now + ttl, value)
+        return value
+
+    def invalidate(self, dbname=None):
+        with self._lock:
+            dbnames = {key[0] for key in self._data} | set(self._generations) if dbname is None else {dbname}
+            for name in dbnames:
+                self._generations[name] = self._generations.get(name, 0) + 1
+                self._stale.add(name)
+            for key in [key for key in self._data if key[0] in dbnames]:
+                del self._data[key]
+
+    def pop_stale(self, dbname):
+        """Return whether data of dbname changed in this worker since the last call"""
+        with self._lock:
+            if dbname in self._stale:
+                self._stale.discard(dbname)
+                return True
+            return False
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+                'size': len(self._data),
+            }
+
+
+kpi_cache = KpiCache()
+
+
+class HospitalKpiCacheMixin(models.AbstractModel):
+    _name = 'hospital.kpi.cache.mixin'
+    _description = 'Dashboard KPI Cache Invalidation'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(HospitalKpiCacheMixin, self).create(vals_list)
+        self._invalidate_kpi_cache()
+        return records
+
+    def write(self, vals):
+        res = super(HospitalKpiCacheMixin, self).write(vals)
+        self._invalidate_kpi_cache()
+        return res
+
+    def unlink(self):
+        res = super(HospitalKpiCacheMixin, self).unlink()
+        self._invalidate_kpi_cache()
+        return res
+
+    def _invalidate_kpi_cache(self):
+        dbname = self.env.cr.dbname
+        kpi_cache.invalidate(dbname)
+        # Invalidate again once the change is visible to other transactions
+        postcommit = self.env.cr.postcommit
+        if not postcommit.data.get('hospital.kpi_cache'):
+            postcommit.data['hospital.kpi_cache'] = True
+            postcommit.add(lambda: kpi_cache.invalidate(dbname))
+
+    @api.model
+    def _get_kpi_cache_ttl(self):
+        ttl = self.env['ir.config_parameter'].sudo().get_param('hospital.kpi_cache_ttl', DEFAULT_TTL)
+        try:
+            return max(int(ttl), 0)
+        except ValueError:
+            return DEFAULT_TTL
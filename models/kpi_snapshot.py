@@ -0,0 +1,135 @@
+from odoo import api, fields, models, _
+from datetime import timedelta
+
+KPI_METRICS = [
+    ('total_patients', 'Total Patients'),
+    ('total_doctors', 'Total Doctors'),
+    ('total_appointments_today', 'Today Appointments'),
+    ('total_admissions_active', 'Active Admissions'),
+    ('total_revenue_month', 'Monthly Revenue'),
+    ('total_pending_bills', 'Pending Bills'),
+    ('bed_occupancy_rate', 'Bed Occupancy %'),
+    ('patient_growth_rate', 'Patient Growth %'),
+]
+
+class HospitalKpiSnapshot(models.Model):
+    _name = 'hospital.kpi.snapshot'
+    _description = 'Hospital Daily KPI Snapshot'
+    _order = 'date desc, metric'
+
+    date = fields.Date(string='Date', required=True, index=True, default=fields.Date.today)
+    metric = fields.Selection(KPI_METRICS, string='Metric', required=True, index=True)
+    value = fields.Float(string='Value')
+
+    _sql_constraints = [
+        ('unique_date_metric', 'unique(date, metric)', 'Only one snapshot per metric and day is allowed!')
+    ]
+
+    @api.model
+    def _compute_kpi_values(self):
+        """Compute the live value of every KPI for today"""
+        today = fields.Date.today()
+        Patient = self.env['hospital.patient']
+        Appointment = self.env['hospital.appointment']
+        Bill = self.env['hospital.bill']
+
+        values = {
+            'total_patients': Patient.search_count([('active', '=', True)]),
+            'total_doctors': self.env['hospital.doctor'].search_count([('active', '=', True)]),
+            'total_appointments_today': Appointment.search_count([
+                ('date_appointment', '>=', today),
+                ('date_appointment', '<', today + timedelta(days=1)),
+                ('state', '!=', 'cancel')
+            ]),
+            'total_admissions_active': self.env['hospital.admission'].search_count([('state', '=', 'active')]),
+            'total_pending_bills': Bill.search_count([('state', '=', 'draft')]),
+        }
+
+        # Monthly revenue from paid bills
+        [[revenue]] = Bill._read_group([
+            ('date_bill', '>=', today.replace(day=1)),
+            ('date_bill', '<=', today),
+            ('state', '=', 'paid')
+        ], aggregates=['total_amount:sum'])
+        values['total_revenue_month'] = revenue or 0.0
+
+        # Bed occupancy rate
+        beds = dict(self.env['hospital.bed']._read_group([('active', '=', True)], groupby=['state'], aggregates=['__count']))
+        total_beds = sum(beds.values())
+        values['bed_occupancy_rate'] = (beds.get('occupied', 0) / total_beds * 100) if total_beds > 0 else 0
+
+        # Patient growth rate (last 30 days vs previous 30 days)
+        thirty_days_ago = today - timedelta(days=30)
+        sixty_days_ago = today - timedelta(days=60)
+        recent_patients = Patient.search_count([
+            ('create_date', '>=', thirty_days_ago),
+            ('create_date', '<=', today)
+        ])
+        previous_patients = Patient.search_count([
+            ('create_date', '>=', sixty_days_ago),
+            ('create_date', '<', thirty_days_ago)
+        ])
+        if previous_patients > 0:
+            values['patient_growth_rate'] = ((recent_patients - previous_patients) / previous_patients) * 100
+        else:
+            values['patient_growth_rate'] = 100.0 if recent_patients > 0 else 0.0
+
+        return values
+
+    @api.model
+    def _update_snapshot(self):
+        """Store today's KPI values. Rows of previous days are never touched.
+
+        Rows are upserted in one statement, so concurrent refreshes (e.g. two
+        dashboards opened on a new day) cannot both insert the same row.
+        """
+        today = fields.Date.today()
+        values = self._compute_kpi_values()
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO hospital_kpi_snapshot (date, metric, value, create_uid, create_date, write_uid, write_date)
+                 SELECT %(date)s, metric, value, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                   FROM unnest(%(metrics)s::varchar[], %(values)s::float8[]) AS kpi(metric, value)
+            ON CONFLICT (date, metric) DO UPDATE
+                    SET value = EXCLUDED.value,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+        """, {
+            'date': today,
+            'uid': self.env.uid,
+            'metrics': list(values),
+            'values': [float(value) for value in values.values()],
+        })
+        self.invalidate_model(['value', 'write_uid', 'write_date'])
+        return values
+
+    @api.model
+    def get_snapshot_values(self, date=None, max_age=None):
+        """Return {metric: value} for the given day.
+
+        Today's snapshot is taken first if it is missing or, with max_age
+        (in seconds), if it was written longer ago than that.
+        """
+        date = date or fields.Date.today()
+        rows = self.search_read([('date', '=', date)], ['metric', 'value', 'write_date'])
+        values = {row['metric']: row['value'] for row in rows}
+        if date == fields.Date.today():
+            outdated = max_age is not None and any(
+                row['write_date'] < fields.Datetime.now() - timedelta(seconds=max_age) for row in rows)
+            if outdated or len(values) < len(KPI_METRICS):
+                values = self.sudo()._update_snapshot()
+        return values
+
+    @api.model
+    def get_metric_history(self, metric, date_from, date_to):
+        """Return the stored daily values of one metric, oldest first, for charting"""
+        return self.search_read([
+            ('metric', '=', metric),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to)
+        ], ['date', 'value'], order='date asc')
+
+    @api.model
+    def _cron_update_snapshots(self):
+        """Cron job refreshing today's KPI snapshot"""
+        self._update_snapshot()
@@ -0,0 +1,7 @@
+from odoo import api, fields, models, _
+
+class MailMail(models.Model):
+    _inherit = 'mail.mail'
+
+    hospital_confirmation = fields.Boolean(string='Appointment Confirmation', readonly=True, help='Confirmation email of a hospital appointment, resent automatically after a transient failure')
+    hospital_retry_count = fields.Integer(string='Retries', default=0, help='Number of times this email was put back in the queue after a failure')
@@ -4,7 +4,7 @@ from odoo.exceptions import ValidationError
 
 class HospitalPatient(models.Model):
     _name = "hospital.patient"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hospital.kpi.cache.mixin']
     _description = "Patient File"
 
     name = fields.Char(string='Name', required=True, tracking=True)
@@ -0,0 +1,157 @@
+from odoo import api, fields, models, _
+from datetime import timedelta
+import json
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+REPORT_METHODS = {
+    'financial': 'generate_financial_report',
+    'operational': 'generate_operational_report',
+    'patient': 'generate_patient_analytics',
+    'doctor': 'generate_doctor_performance',
+}
+
+JOB_BATCH_SIZE = 10
+
+# A job still running after this long was interrupted (e.g. its worker was killed)
+JOB_TIMEOUT = timedelta(hours=1)
+
+class HospitalReportJob(models.Model):
+    _name = 'hospital.report.job'
+    _description = 'Background Analytics Report'
+    _order = 'create_date desc'
+    _rec_name = 'report_type'
+
+    report_type = fields.Selection([
+        ('financial', 'Financial Report'),
+        ('operational', 'Operational Report'),
+        ('patient', 'Patient Analytics'),
+        ('doctor', 'Doctor Performance'),
+    ], string='Report Type', required=True, index=True)
+    date_from = fields.Date(string='From Date', required=True, index=True)
+    date_to = fields.Date(string='To Date', required=True, index=True)
+    department_id = fields.Many2one('hospital.department', string='Department')
+    specialization_id = fields.Many2one('hospital.specialization', string='Specialization')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, index=True)
+    date_started = fields.Datetime(string='Started On', readonly=True)
+    is_stuck = fields.Boolean(string='Interrupted', compute='_compute_is_stuck')
+    result = fields.Json(string='Result', readonly=True)
+    result_text = fields.Text(string='Result', compute='_compute_result_text')
+    date_done = fields.Datetime(string='Computed On', readonly=True)
+    error_message = fields.Text(string='Error Message', readonly=True)
+
+    @api.depends('result')
+    def _compute_result_text(self):
+        for rec in self:
+            rec.result_text = json.dumps(rec.result, indent=2) if rec.result else False
+
+    @api.depends('state', 'date_started')
+    def _compute_is_stuck(self):
+        limit = fields.Datetime.now() - JOB_TIMEOUT
+        for rec in self:
+            rec.is_stuck = rec.state == 'running' and (not rec.date_started or rec.date_started < limit)
+
+    def _job_key_domain(self, report_type, date_from, date_to, department_id=False, specialization_id=False):
+        return [
+            ('report_type', '=', report_type),
+            ('date_from', '=', date_from),
+            ('date_to', '=', date_to),
+            ('department_id', '=', department_id),
+            ('specialization_id', '=', specialization_id),
+        ]
+
+    @api.model
+    def _get_cached_job(self, report_type, date_from, date_to, department_id=False, specialization_id=False):
+        """Return a finished job whose result can no longer change, i.e. computed after the period closed"""
+        date_to = fields.Date.to_date(date_to)
+        job = self.search(self._job_key_domain(report_type, date_from, date_to, department_id, specialization_id) + [
+            ('state', '=', 'done'),
+        ], order='date_done desc', limit=1)
+        if job and job.date_done.date() > date_to:
+            return job
+        return self.browse()
+
+    @api.model
+    def request_report(self, report_type, date_from, date_to, department_id=False, specialization_id=False):
+        """Return a cached, running or newly queued job for the given report and period"""
+        job = self._get_cached_job(report_type, date_from, date_to, department_id, specialization_id)
+        if job:
+            return job
+        job = self.search(self._job_key_domain(report_type, date_from, date_to, department_id, specialization_id) + [
+            ('state', 'in', ['pending', 'running']),
+        ], limit=1)
+        if job:
+            return job
+        job = self.create({
+            'report_type': report_type,
+            'date_from': date_from,
+            'date_to': date_to,
+            'department_id': department_id,
+            'specialization_id': specialization_id,
+        })
+        self.env.ref('gestion_hospitaliere.ir_cron_process_report_jobs')._trigger()
+        return job
+
+    def _run(self):
+        self.ensure_one()
+        wizard = self.env['hospital.analytics'].create({
+            'report_type': self.report_type,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'department_id': self.department_id.id,
+            'specialization_id': self.specialization_id.id,
+        })
+        return getattr(wizard, REPORT_METHODS[self.report_type])()
+
+    @api.model
+    def _requeue_stuck_jobs(self):
+        """Put back in the queue the jobs whose computation was interrupted"""
+        stuck = self.search([
+            ('state', '=', 'running'),
+            '|', ('date_started', '=', False), ('date_started', '<', fields.Datetime.now() - JOB_TIMEOUT),
+        ])
+        if stuck:
+            _logger.warning(f"Requeuing {len(stuck)} interrupted report jobs")
+            stuck.write({'state': 'pending', 'date_started': False})
+        return stuck
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Cron job computing queued reports, committing after each one"""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self._requeue_stuck_jobs()
+        jobs = self.search([('state', '=', 'pending')], order='create_date asc', limit=JOB_BATCH_SIZE + 1)
+        for job in jobs[:JOB_BATCH_SIZE]:
+            job.write({'state': 'running', 'date_started': fields.Datetime.now()})
+            if auto_commit:
+                self.env.cr.commit()
+            try:
+                result = job._run()
+                job.write({
+                    'state': 'done',
+                    'result': result,
+                    'date_done': fields.Datetime.now(),
+                    'error_message': False,
+                })
+            except Exception as e:
+                if auto_commit:
+                    self.env.cr.rollback()
+                _logger.error(f"Failed to compute {job.report_type} report: {str(e)}")
+                job.write({'state': 'failed', 'error_message': str(e)})
+            if auto_commit:
+                self.env.cr.commit()
+        if len(jobs) > JOB_BATCH_SIZE:
+            self.env.ref('gestion_hospitaliere.ir_cron_process_report_jobs')._trigger()
+
+    def action_retry(self):
+        """Queue failed or interrupted jobs again"""
+        jobs = self.filtered(lambda j: j.state == 'failed' or j.is_stuck)
+        jobs.write({'state': 'pending', 'date_started': False, 'error_message': False})
+        self.env.ref('gestion_hospitaliere.ir_cron_process_report_jobs')._trigger()
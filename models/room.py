@@ -16,12 +16,12 @@ class HospitalRoom(models.Model):
         ('icu', 'ICU'),
         ('emergency', 'Emergency'),
         ('operation', 'Operation Theater'),
-    ], string='Room Type', default='general', required=True, tracking=True)
+    ], string='Room Type', default='general', required=True, index=True, tracking=True)
     department_id = fields.Many2one('hospital.department', string="Department", tracking=True)
     bed_ids = fields.One2many('hospital.bed', 'room_id', string="Beds")
-    capacity = fields.Integer(string='Capacity', compute='_compute_capacity', store=True)
-    occupied_beds = fields.Integer(string='Occupied Beds', compute='_compute_occupied_beds')
-    available_beds = fields.Integer(string='Available Beds', compute='_compute_available_beds')
+    capacity = fields.Integer(string='Capacity', compute='_compute_bed_counts', store=True)
+    occupied_beds = fields.Integer(string='Occupied Beds', compute='_compute_bed_counts', store=True)
+    available_beds = fields.Integer(string='Available Beds', compute='_compute_bed_counts', store=True, index=True, help='Beds currently free')
     floor = fields.Char(string='Floor')
     daily_rate = fields.Float(string='Daily Rate', help='Daily room charge')
     description = fields.Text(string='Description')
@@ -31,17 +31,29 @@ class HospitalRoom(models.Model):
         ('unique_room_name', 'unique(name)', 'Room number must be unique!')
     ]
 
-    @api.depends('bed_ids')
-    def _compute_capacity(self):
+    @api.depends('bed_ids', 'bed_ids.state', 'bed_ids.active')
+    def _compute_bed_counts(self):
+        # Stored, so only the rooms of beds whose state changed are recomputed
         for rec in self:
-            rec.capacity = len(rec.bed_ids)
+            states = rec.bed_ids.mapped('state')
+            rec.capacity = len(states)
+            rec.occupied_beds = states.count('occupied')
+            rec.available_beds = states.count('free')
 
-    @api.depends('bed_ids.state')
-    def _compute_occupied_beds(self):
-        for rec in self:
-            rec.occupied_beds = len(rec.bed_ids.filtered(lambda b: b.state == 'occupied'))
-
-    @api.depends('capacity', 'occupied_beds')
-    def _compute_available_beds(self):
-        for rec in self:
-            rec.available_beds = rec.capacity - rec.occupied_beds
+    @api.model
+    def get_occupancy_rollup(self, groupby='room_type', domain=None):
+        """Bed capacity, occupied and free beds summed per room type or department, in one query"""
+        result = []
+        for group, rooms, capacity, occupied, available in self._read_group(
+            domain or [], groupby=[groupby],
+            aggregates=['__count', 'capacity:sum', 'occupied_beds:sum', 'available_beds:sum'],
+        ):
+            result.append({
+                groupby: group.display_name if isinstance(group, models.BaseModel) else group,
+                'rooms': rooms,
+                'capacity': capacity,
+                'occupied_beds': occupied,
+                'available_beds': available,
+                'occupancy_rate': round(occupied / capacity * 100, 2) if capacity else 0.0,
+            })
+        return result
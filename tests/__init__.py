@@ -1,3 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from . import test_basic
+from . import test_analytics
+from . import test_benchmark
+from . import test_appointment
+from . import test_calendar_feed
+from . import test_admission
+from . import test_bill
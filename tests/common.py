@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import random
+from datetime import datetime, time, timedelta
+
+from odoo import fields
+from odoo.tools.misc import file_open
+
+
+def _read_import_csv(filename):
+    with file_open('gestion_hospitaliere/data/import/%s' % filename) as f:
+        return list(csv.DictReader(f))
+
+
+class HospitalDataGenerator(object):
+    """Deterministic synthetic data for the hospital models.
+
+    Records are shaped after the sample files in data/import/*.csv and
+    created in batches. For a given seed and reference date the generated
+    data is always the same, so successive calls can grow a database
+    step by step (e.g. 100, then 1000 patients).
+    """
+
+    def __init__(self, env, seed=42, prefix='GEN', reference_date=None):
+        self.env = env
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.reference_date = reference_date or fields.Date.today()
+        self.sequence = 0
+        self._doctor_slots = {}
+
+        self.patient_rows = _read_import_csv('patients.csv')
+        self.doctor_rows = _read_import_csv('doctors.csv')
+        self.department_rows = _read_import_csv('departments.csv')
+        self.room_rows = _read_import_csv('rooms.csv')
+        self.medicine_rows = _read_import_csv('medicines.csv')
+        self.appointment_rows = _read_import_csv('appointments.csv')
+        self.admission_rows = _read_import_csv('admissions.csv')
+
+        self.departments = self.env['hospital.department']
+        self.doctors = self.env['hospital.doctor']
+        self.patients = self.env['hospital.patient']
+        self.beds = self.env['hospital.bed']
+        self.medicines = self.env['hospital.medicine']
+        self.appointments = self.env['hospital.appointment']
+
+    def _next(self):
+        self.sequence += 1
+        return self.sequence
+
+    def _random_datetime(self, days_back, days_forward=0):
+        day = self.reference_date + timedelta(days=self.random.randint(-days_back, days_forward))
+        return datetime.combine(day, time(self.random.randint(8, 17), self.random.choice([0, 30])))
+
+    def generate(self, patients=100, doctors=None, rooms=None, beds_per_room=4, appointments=None,
+                 admissions=None, bills=None, prescriptions=None):
+        """Add a hospital of the given size on top of what was generated before"""
+        doctors = doctors if doctors is not None else max(5, patients // 50)
+        rooms = rooms if rooms is not None else max(2, patients // 100)
+        self.create_departments()
+        self.create_medicines()
+        self.create_doctors(doctors)
+        self.create_rooms(rooms, beds_per_room)
+        self.create_patients(patients)
+        self.create_appointments(appointments if appointments is not None else patients * 3)
+        self.create_admissions(admissions if admissions is not None else patients // 5)
+        self.create_bills(bills if bills is not None else patients)
+        self.create_prescriptions(prescriptions if prescriptions is not None else patients // 2)
+        self.env.flush_all()
+
+    def create_departments(self):
+        if self.departments:
+            return self.departments
+        self.departments = self.env['hospital.department'].create([{
+            'name': '%s %s' % (self.prefix, row['name']),
+            'description': row['description'],
+        } for row in self.department_rows])
+        return self.departments
+
+    def create_medicines(self):
+        if self.medicines:
+            return self.medicines
+        self.medicines = self.env['hospital.medicine'].create([{
+            'name': '%s %s' % (self.prefix, row['name']),
+            'category': row['category'],
+            'manufacturer': row['manufacturer'],
+            'dosage_form': row['dosage_form'],
+            'unit_price': float(row['unit_price']),
+            'stock_quantity': int(row['stock_quantity']),
+        } for row in self.medicine_rows])
+        return self.medicines
+
+    def create_doctors(self, count):
+        vals_list = []
+        for _i in range(count):
+            row = self.random.choice(self.doctor_rows)
+            seq = self._next()
+            vals_list.append({
+                'name': '%s #%s' % (row['name'], seq),
+                'gender': row['gender'],
+                'phone': row['phone'],
+                'email': 'doctor%s@%s.example.com' % (seq, self.prefix.lower()),
+                'department_id': self.random.choice(self.departments).id,
+            })
+        doctors = self.env['hospital.doctor'].create(vals_list)
+        self.doctors |= doctors
+        return doctors
+
+    def create_rooms(self, count, beds_per_room):
+        rooms = self.env['hospital.room'].create([{
+            'name': '%s-R%05d' % (self.prefix, self._next()),
+            'room_type': self.random.choice(self.room_rows)['room_type'],
+            'department_id': self.random.choice(self.departments).id,
+            'daily_rate': self.random.choice([300.0, 500.0, 800.0, 1500.0]),
+        } for _i in range(count)])
+        beds = self.env['hospital.bed'].create([{
+            'name': '%s-%s' % (room.name, chr(ord('A') + index)),
+            'room_id': room.id,
+            'bed_type': 'icu' if room.room_type == 'icu' else 'standard',
+        } for room in rooms for index in range(beds_per_room)])
+        self.beds |= beds
+        return rooms
+
+    def create_patients(self, count):
+        vals_list = []
+        for _i in range(count):
+            row = self.random.choice(self.patient_rows)
+            seq = self._next()
+            vals_list.append({
+                'name': '%s #%s' % (row['name'], seq),
+                'gender': row['gender'],
+                'date_of_birth': self.reference_date - timedelta(days=self.random.randint(0, 90 * 365)),
+                'phone': row['phone'],
+                'email': 'patient%s@%s.example.com' % (seq, self.prefix.lower()),
+                'address': row['address'],
+                'blood_group': row['blood_group'],
+            })
+        patients = self.env['hospital.patient'].create(vals_list)
+        self.patients |= patients
+        return patients
+
+    def create_appointments(self, count, days_back=365, days_forward=30):
+        """Create non-overlapping appointments, handing out consecutive slots per doctor"""
+        vals_list = []
+        span = days_back + days_forward
+        for _i in range(count):
+            doctor = self.random.choice(self.doctors)
+            row = self.random.choice(self.appointment_rows)
+            duration = float(row['duration'])
+            slot = self._doctor_slots.get(doctor.id)
+            if slot is None:
+                slot = datetime.combine(self.reference_date - timedelta(days=days_back), time(8, 0))
+                # Spread each doctor's calendar over the whole period
+                slot += timedelta(hours=self.random.randint(0, span * 24 // 2))
+            date_appointment = slot
+            self._doctor_slots[doctor.id] = slot + timedelta(hours=duration + self.random.choice([0, 0.5, 1, 24]))
+            in_past = date_appointment.date() < self.reference_date
+            vals_list.append({
+                'patient_id': self.random.choice(self.patients).id,
+                'doctor_id': doctor.id,
+                'date_appointment': date_appointment,
+                'duration': duration,
+                'appointment_type': row['appointment_type'],
+                'state': self.random.choice(['done', 'done', 'cancel']) if in_past else self.random.choice(['draft', 'confirmed']),
+                'note': row['note'],
+            })
+        appointments = self.env['hospital.appointment'].create(vals_list)
+        self.appointments |= appointments
+        return appointments
+
+    def create_admissions(self, count):
+        vals_list = []
+        free_beds = list(self.beds.filtered(lambda b: b.state == 'free'))
+        self.random.shuffle(free_beds)
+        occupied = self.env['hospital.bed']
+        for _i in range(count):
+            row = self.random.choice(self.admission_rows)
+            date_admission = self._random_datetime(365)
+            vals = {
+                'patient_id': self.random.choice(self.patients).id,
+                'doctor_id': self.random.choice(self.doctors).id,
+                'date_admission': date_admission,
+                'admission_type': row['admission_type'],
+                'diagnosis': row['diagnosis'],
+            }
+            # Keep roughly one admission in ten active while free beds remain
+            if free_beds and self.random.random() < 0.1:
+                bed = free_beds.pop()
+                occupied |= bed
+                vals.update({'bed_id': bed.id, 'state': 'active'})
+            else:
+                vals.update({
+                    'bed_id': self.random.choice(self.beds).id,
+                    'state': 'discharged',
+                    'discharge_date': date_admission + timedelta(hours=self.random.randint(4, 24 * 14)),
+                })
+            vals_list.append(vals)
+        admissions = self.env['hospital.admission'].create(vals_list)
+        occupied.write({'state': 'occupied'})
+        return admissions
+
+    def create_bills(self, count):
+        vals_list = []
+        done_appointments = self.appointments.filtered(lambda a: a.state == 'done')
+        for _i in range(count):
+            appointment = self.random.choice(done_appointments) if done_appointments else self.appointments.browse()
+            date_bill = appointment.date_appointment.date() if appointment else self._random_datetime(365).date()
+            lines = [(0, 0, {
+                'product_type': 'consultation',
+                'description': 'Consultation',
+                'quantity': 1,
+                'unit_price': self.random.choice([200.0, 300.0, 400.0]),
+            })]
+            for medicine in self.random.sample(list(self.medicines), self.random.randint(0, 3)):
+                lines.append((0, 0, {
+                    'product_type': 'medicine',
+                    'medicine_id': medicine.id,
+                    'description': medicine.name,
+                    'quantity': self.random.randint(1, 3),
+                    'unit_price': medicine.unit_price,
+                }))
+            vals_list.append({
+                'patient_id': appointment.patient_id.id if appointment else self.random.choice(self.patients).id,
+                'appointment_id': appointment.id,
+                'date_bill': date_bill,
+                'due_date': date_bill + timedelta(days=7),
+                'payment_method': self.random.choice(['cash', 'card', 'insurance', 'bank_transfer']),
+                'state': self.random.choice(['paid', 'paid', 'paid', 'draft', 'cancel']),
+                'bill_line_ids': lines,
+            })
+        return self.env['hospital.bill'].create(vals_list)
+
+    def create_prescriptions(self, count):
+        return self.env['hospital.prescription'].create([{
+            'patient_id': self.random.choice(self.patients).id,
+            'doctor_id': self.random.choice(self.doctors).id,
+            'prescription_date': self._random_datetime(365),
+            'state': self.random.choice(['draft', 'done']),
+            'prescription_line_ids': [(0, 0, {
+                'medicine_id': medicine.id,
+                'name': medicine.name,
+                'duration_days': self.random.choice([5, 7, 10]),
+                'quantity': self.random.randint(1, 3),
+            }) for medicine in self.random.sample(list(self.medicines), self.random.randint(1, 3))],
+        } for _i in range(count)])
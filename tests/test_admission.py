@@ -0,0 +1,116 @@
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+from odoo.fields import Date, Datetime
+from dateutil.relativedelta import relativedelta
+
+class TestHospitalAdmission(TransactionCase):
+
+    def setUp(self):
+        super(TestHospitalAdmission, self).setUp()
+        self.admission_model = self.env['hospital.admission']
+        self.patients = self.env['hospital.patient'].create([{
+            'name': 'Intake Patient %s' % index,
+            'gender': 'female',
+            'date_of_birth': Date.today() - relativedelta(years=30 + index),
+        } for index in range(3)])
+        self.room = self.env['hospital.room'].create({'name': 'Intake Ward', 'room_type': 'emergency', 'daily_rate': 400.0})
+        self.beds = self.env['hospital.bed'].create([{
+            'name': 'Intake Bed %s' % index,
+            'room_id': self.room.id,
+        } for index in range(3)])
+
+    def test_batch_admission(self):
+        """Test admitting several patients in one call"""
+        admissions = self.admission_model.admit_patients([{
+            'patient_id': patient.id,
+            'bed_id': bed.id,
+        } for patient, bed in zip(self.patients, self.beds)])
+        self.assertEqual(set(admissions.mapped('state')), {'active'})
+        self.assertEqual(set(self.beds.mapped('state')), {'occupied'})
+
+    def test_same_bed_in_batch_rejected(self):
+        """Test that one bed cannot be given to two admissions of a batch"""
+        with self.assertRaises(ValidationError):
+            self.admission_model.admit_patients([{
+                'patient_id': patient.id,
+                'bed_id': self.beds[0].id,
+            } for patient in self.patients[:2]])
+
+    def test_bed_taken_by_active_admission(self):
+        """Test that a bed held by an active admission cannot be re-allocated"""
+        first = self.admission_model.admit_patients([{'patient_id': self.patients[0].id, 'bed_id': self.beds[0].id}])
+        second = self.admission_model.create({'patient_id': self.patients[1].id, 'bed_id': self.beds[1].id})
+        second.action_admit()
+        with self.assertRaises(ValidationError):
+            second.write({'bed_id': self.beds[0].id})
+        first.action_discharge()
+        second.write({'bed_id': self.beds[0].id})
+        self.assertEqual(self.beds[0].state, 'occupied')
+        self.assertEqual(self.beds[1].state, 'free')
+
+    def test_room_counters_follow_bed_state(self):
+        """Test that stored room counters follow admissions and are searchable"""
+        self.assertEqual((self.room.capacity, self.room.occupied_beds, self.room.available_beds), (3, 0, 3))
+        self.admission_model.admit_patients([{'patient_id': self.patients[0].id, 'bed_id': self.beds[0].id}])
+        self.beds[1].state = 'maintenance'
+        self.assertEqual((self.room.capacity, self.room.occupied_beds, self.room.available_beds), (3, 1, 1))
+
+        rooms = self.env['hospital.room'].search([('room_type', '=', 'emergency'), ('available_beds', '>', 0)])
+        self.assertIn(self.room, rooms)
+        rollup = {row['room_type']: row for row in self.env['hospital.room'].get_occupancy_rollup('room_type')}
+        self.assertGreaterEqual(rollup['emergency']['occupied_beds'], 1)
+
+    def test_occupancy_timeline(self):
+        """Test the daily occupancy sweep and the projection of planned admissions"""
+        today = Date.today()
+        start = Datetime.to_datetime(today) - relativedelta(days=2)
+        self.admission_model.create({
+            'patient_id': self.patients[0].id,
+            'bed_id': self.beds[0].id,
+            'date_admission': start + relativedelta(hours=10),
+            'discharge_date': start + relativedelta(days=1, hours=10),
+            'state': 'discharged',
+        })
+        self.admission_model.create({
+            'patient_id': self.patients[1].id,
+            'bed_id': self.beds[1].id,
+            'date_admission': Datetime.to_datetime(today) + relativedelta(days=2, hours=9),
+            'discharge_date': Datetime.to_datetime(today) + relativedelta(days=3, hours=9),
+        })
+        timeline = self.admission_model.get_occupancy_timeline(today - relativedelta(days=2), today + relativedelta(days=4), groupby='room')
+        self.assertEqual(len(timeline['periods']), 7)
+        [ward] = [series for series in timeline['series'] if series['key'] == self.room.id]
+        self.assertEqual(ward['capacity'], 3)
+        self.assertEqual(ward['occupied'][:2], [1, 1])
+        self.assertEqual(ward['projected'], [1, 1, 0, 0, 1, 1, 0])
+
+    def test_bulk_discharge(self):
+        """Test discharging a whole ward at once, with a summary template"""
+        admissions = self.admission_model.admit_patients([{
+            'patient_id': patient.id,
+            'bed_id': bed.id,
+        } for patient, bed in zip(self.patients, self.beds)])
+        admissions[0].discharge_summary = 'Written by hand'
+        messages_before = self.env['mail.message'].search_count([('model', '=', 'hospital.admission'), ('res_id', 'in', admissions.ids)])
+
+        admissions.discharge_admissions(summary_template='{reference} discharged from {bed}')
+        self.assertEqual(set(admissions.mapped('state')), {'discharged'})
+        self.assertEqual(set(self.beds.mapped('state')), {'free'})
+        self.assertEqual(admissions[0].discharge_summary, 'Written by hand')
+        self.assertEqual(admissions[1].discharge_summary, '%s discharged from %s' % (admissions[1].reference, self.beds[1].name))
+        messages_after = self.env['mail.message'].search_count([('model', '=', 'hospital.admission'), ('res_id', 'in', admissions.ids)])
+        self.assertEqual(messages_after - messages_before, 3)
+
+        discharge_dates = admissions.mapped('discharge_date')
+        with self.assertRaises(ValidationError):
+            admissions.discharge_admissions()
+        self.assertEqual(admissions.mapped('discharge_date'), discharge_dates)
+
+        draft = self.admission_model.create({'patient_id': self.patients[0].id, 'bed_id': self.beds[0].id})
+        with self.assertRaises(ValidationError):
+            draft.discharge_admissions()
+        self.assertEqual(draft.state, 'draft')
+
+        active = self.admission_model.admit_patients([{'patient_id': self.patients[1].id, 'bed_id': self.beds[1].id}])
+        with self.assertRaises(ValidationError):
+            active.discharge_admissions(summary_template='{unknown}')
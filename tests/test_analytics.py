@@ -0,0 +1,295 @@
+from odoo.tests.common import TransactionCase
+from odoo.fields import Date, Datetime
+from dateutil.relativedelta import relativedelta
+from unittest.mock import patch
+import csv
+import io
+
+from ..models.kpi_cache import KpiCache, kpi_cache
+from ..models.kpi_snapshot import KPI_METRICS
+
+class TestHospitalAnalytics(TransactionCase):
+
+    def setUp(self):
+        super(TestHospitalAnalytics, self).setUp()
+        self.patient = self.env['hospital.patient'].create({
+            'name': 'Analytics Patient',
+            'gender': 'female',
+            'date_of_birth': Date.today() - relativedelta(years=40),
+        })
+        self.analytics = self.env['hospital.analytics'].create({
+            'date_from': Date.today() - relativedelta(days=30),
+            'date_to': Date.today(),
+        })
+
+    def _create_bill(self, lines, state='draft', payment_method=False):
+        bill = self.env['hospital.bill'].create({
+            'patient_id': self.patient.id,
+            'payment_method': payment_method,
+            'bill_line_ids': [(0, 0, {
+                'product_type': product_type,
+                'description': product_type,
+                'quantity': 1,
+                'unit_price': price,
+            }) for product_type, price in lines],
+        })
+        if state != 'draft':
+            bill.state = state
+        return bill
+
+    def test_financial_report(self):
+        """Test grouped financial totals"""
+        self._create_bill([('consultation', 100.0), ('lab', 50.0)], state='paid', payment_method='cash')
+        self._create_bill([('room', 200.0)], state='paid', payment_method='card')
+        self._create_bill([('medicine', 30.0)])
+
+        report = self.analytics.generate_financial_report()
+
+        self.assertEqual(report['total_revenue'], 350.0)
+        self.assertEqual(report['pending_revenue'], 30.0)
+        self.assertEqual(report['patient_payments'], 380.0)
+        self.assertEqual(report['total_bills'], 3)
+        self.assertEqual(report['paid_bills'], 2)
+        self.assertEqual(report['pending_bills'], 1)
+        self.assertEqual(report['revenue_by_method']['cash'], 150.0)
+        self.assertEqual(report['revenue_by_method']['card'], 200.0)
+        self.assertEqual(report['revenue_by_method']['bank_transfer'], 0)
+        self.assertEqual(report['revenue_by_service'], {'consultation': 100.0, 'lab': 50.0, 'room': 200.0})
+
+    def test_doctor_performance_department_filter(self):
+        """Test grouped doctor statistics and department filter"""
+        cardiology = self.env['hospital.department'].create({'name': 'Analytics Cardiology'})
+        doctor = self.env['hospital.doctor'].create({'name': 'Dr. Grouped', 'department_id': cardiology.id})
+        self.env['hospital.doctor'].create({'name': 'Dr. Elsewhere'})
+        now = Date.today() - relativedelta(days=2)
+        appointment = self.env['hospital.appointment'].create({
+            'patient_id': self.patient.id,
+            'doctor_id': doctor.id,
+            'date_appointment': now,
+        })
+        appointment.action_done()
+        self.env['hospital.appointment'].create({
+            'patient_id': self.patient.id,
+            'doctor_id': doctor.id,
+            'date_appointment': now + relativedelta(hours=2),
+        })
+        bill = self._create_bill([('consultation', 80.0)], state='paid', payment_method='cash')
+        bill.appointment_id = appointment
+
+        self.analytics.department_id = cardiology
+        report = self.analytics.generate_doctor_performance()
+
+        self.assertEqual(report['total_doctors'], 1)
+        stats = report['doctor_performance'][0]
+        self.assertEqual(stats['name'], 'Dr. Grouped')
+        self.assertEqual(stats['appointments'], 2)
+        self.assertEqual(stats['completed_appointments'], 1)
+        self.assertEqual(stats['completion_rate'], 50.0)
+        self.assertEqual(stats['revenue_generated'], 80.0)
+
+    def test_patient_analytics(self):
+        """Test database-side demographic buckets"""
+        self.env['hospital.patient'].create({
+            'name': 'Senior Patient',
+            'gender': 'male',
+            'blood_group': 'o-',
+            'date_of_birth': Date.today() - relativedelta(years=80),
+        })
+        report = self.analytics.generate_patient_analytics()
+
+        self.assertGreaterEqual(report['age_distribution']['36-55'], 1)
+        self.assertGreaterEqual(report['age_distribution']['75+'], 1)
+        self.assertGreaterEqual(report['blood_group_distribution']['O-'], 1)
+        self.assertEqual(sum(report['age_distribution'].values()), report['total_patients'])
+        self.assertEqual(sum(report['gender_distribution'].values()), report['total_patients'])
+
+    def test_length_of_stay(self):
+        """Test stored stay durations and database-side length of stay statistics"""
+        surgery = self.env['hospital.department'].create({'name': 'Analytics Surgery'})
+        doctor = self.env['hospital.doctor'].create({'name': 'Dr. Stay', 'department_id': surgery.id})
+        start = Datetime.to_datetime(Date.today() - relativedelta(days=20))
+        admissions = self.env['hospital.admission'].create([{
+            'patient_id': self.patient.id,
+            'doctor_id': doctor.id,
+            'admission_type': 'emergency',
+            'date_admission': start,
+            'discharge_date': start + relativedelta(days=days),
+            'state': 'discharged',
+        } for days in (1, 2, 6)])
+        self.assertEqual(admissions.mapped('stay_duration'), [1.0, 2.0, 6.0])
+
+        report = self.analytics.generate_operational_report()
+        [department] = [row for row in report['admissions']['length_of_stay']['by_department'] if row['department_id'] == surgery.id]
+        self.assertEqual((department['count'], department['average'], department['median']), (3, 3.0, 2.0))
+        [doctor_stats] = [row for row in report['admissions']['length_of_stay']['by_doctor'] if row['doctor_id'] == doctor.id]
+        self.assertEqual(doctor_stats['p90'], 5.2)
+        self.assertGreaterEqual(report['admissions']['discharged'], 3)
+
+    def test_kpi_snapshot(self):
+        """Test that the dashboard reads today's snapshot and past rows are kept"""
+        Snapshot = self.env['hospital.kpi.snapshot']
+        old = Snapshot.create({'date': Date.today() - relativedelta(days=1), 'metric': 'total_patients', 'value': 7})
+
+        dashboard = self.env['hospital.dashboard'].create({})
+        total = self.env['hospital.patient'].search_count([('active', '=', True)])
+        self.assertEqual(dashboard.total_patients, total)
+        self.assertTrue(Snapshot.search_count([('date', '=', Date.today()), ('metric', '=', 'total_patients')]))
+
+        # The dashboard serves the stored row, not a live recount
+        Snapshot.search([('date', '=', Date.today()), ('metric', '=', 'total_patients')]).value = total + 100
+        kpi_cache.invalidate()
+        kpi_cache.pop_stale(self.env.cr.dbname)
+        dashboard.invalidate_recordset()
+        self.assertEqual(dashboard.total_patients, total + 100)
+
+        # A row older than the cache TTL is rebuilt, whichever worker wrote the data
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE hospital_kpi_snapshot SET write_date = write_date - interval '1 day' WHERE date = %s", [Date.today()])
+        self.env.invalidate_all()
+        kpi_cache.invalidate()
+        kpi_cache.pop_stale(self.env.cr.dbname)
+        self.assertEqual(dashboard.total_patients, total)
+
+        Snapshot._cron_update_snapshots()
+        Snapshot._update_snapshot()
+        self.assertEqual(Snapshot.search_count([('date', '=', Date.today())]), len(KPI_METRICS))
+        self.assertEqual(old.value, 7, "Past snapshots must never be recomputed")
+        history = Snapshot.get_metric_history('total_patients', Date.today() - relativedelta(days=1), Date.today())
+        self.assertEqual([row['value'] for row in history], [7, total])
+
+    def test_dashboard_kpi_cache(self):
+        """Test that repeated dashboard reads hit the cache until a bill changes"""
+        dashboard = self.env['hospital.dashboard'].create({})
+        dashboard.total_pending_bills
+        hits = self.env['hospital.dashboard'].get_kpi_cache_stats()['hits']
+
+        dashboard.invalidate_recordset()
+        pending = dashboard.total_pending_bills
+        self.assertGreater(self.env['hospital.dashboard'].get_kpi_cache_stats()['hits'], hits)
+
+        self._create_bill([('other', 10.0)])
+        dashboard.invalidate_recordset()
+        self.assertEqual(dashboard.total_pending_bills, pending + 1)
+
+    def test_kpi_cache_invalidated_during_compute(self):
+        """Test that a value computed across an invalidation is not kept"""
+        cache = KpiCache()
+
+        def compute():
+            cache.invalidate('db')
+            return 'stale'
+
+        self.assertEqual(cache.get(('db', 'today'), compute), 'stale')
+        self.assertEqual(cache.get(('db', 'today'), lambda: 'fresh'), 'fresh')
+        self.assertEqual(cache.get(('db', 'today'), lambda: 'other'), 'fresh')
+
+    def test_revenue_chart_gap_filled(self):
+        """Test that the revenue series has one entry per calendar month"""
+        first_day = Date.today().replace(day=1)
+        bill = self._create_bill([('consultation', 120.0)], state='paid', payment_method='cash')
+        bill.date_bill = first_day - relativedelta(months=2)
+
+        dashboard = self.env['hospital.dashboard'].create({})
+        data = dashboard.get_revenue_chart_data(first_day - relativedelta(months=3), Date.today())
+
+        self.assertEqual([row['date'] for row in data], [
+            Date.to_string(first_day - relativedelta(months=offset)) for offset in (3, 2, 1, 0)
+        ])
+        self.assertEqual(data[1]['revenue'], 120.0)
+        self.assertEqual(len(dashboard.get_revenue_chart_data()), 6)
+
+    def test_department_distribution(self):
+        """Test joined department counts with the unassigned bucket"""
+        department = self.env['hospital.department'].create({'name': 'Analytics Neurology'})
+        assigned = self.env['hospital.doctor'].create({'name': 'Dr. Assigned', 'department_id': department.id})
+        unassigned = self.env['hospital.doctor'].create({'name': 'Dr. Floating'})
+        when = Date.today() - relativedelta(days=1)
+        for doctor, offset in ((assigned, 0), (assigned, 1), (unassigned, 0)):
+            self.env['hospital.appointment'].create({
+                'patient_id': self.patient.id,
+                'doctor_id': doctor.id,
+                'date_appointment': when + relativedelta(hours=offset),
+            })
+
+        dashboard = self.env['hospital.dashboard'].create({})
+        data = {row['department']: row for row in dashboard.get_department_patient_distribution(include_patients=True)}
+
+        self.assertEqual(data['Analytics Neurology']['count'], 2)
+        self.assertEqual(data['Analytics Neurology']['patients'], 1)
+        self.assertGreaterEqual(data['Unassigned']['count'], 1)
+
+    def test_export_csv_in_chunks(self):
+        """Test that the row-level export pages through all bill lines"""
+        self._create_bill([('consultation', 100.0), ('lab', 50.0)], state='paid', payment_method='cash')
+        self._create_bill([('room', 200.0)])
+        self.analytics.write({'report_type': 'financial', 'export_format': 'csv'})
+
+        output = io.BytesIO()
+        with patch('odoo.addons.gestion_hospitaliere.models.analytics.EXPORT_CHUNK_SIZE', 1):
+            self.analytics._write_export(output)
+        rows = list(csv.reader(io.StringIO(output.getvalue().decode('utf-8'))))
+
+        self.assertEqual(rows[0][0], 'Bill')
+        self.assertEqual(sorted(row[5] for row in rows[1:]), ['consultation', 'lab', 'room'])
+
+    def test_export_includes_last_day(self):
+        """Test that rows timestamped during the last day of the range are exported"""
+        admission = self.env['hospital.admission'].create({
+            'patient_id': self.patient.id,
+            'date_admission': Datetime.to_datetime(self.analytics.date_to) + relativedelta(hours=15),
+        })
+        self.analytics.write({'report_type': 'operational', 'export_format': 'csv'})
+
+        output = io.BytesIO()
+        self.analytics._write_export(output)
+        rows = list(csv.reader(io.StringIO(output.getvalue().decode('utf-8'))))
+        self.assertIn(admission.reference, [row[0] for row in rows[1:]])
+
+    def test_export_applies_record_rules(self):
+        """Test that the export skips rows hidden by record rules"""
+        self._create_bill([('consultation', 100.0), ('lab', 50.0)], state='paid', payment_method='cash')
+        manager = self.env['res.users'].create({
+            'name': 'Export Manager',
+            'login': 'export.manager',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id, self.env.ref('gestion_hospitaliere.group_hospital_manager').id])],
+        })
+        self.env['ir.rule'].create({
+            'name': 'No lab lines',
+            'model_id': self.env.ref('gestion_hospitaliere.model_hospital_bill_line').id,
+            'domain_force': "[('product_type', '!=', 'lab')]",
+            'groups': [(4, self.env.ref('gestion_hospitaliere.group_hospital_manager').id)],
+        })
+        self.analytics.write({'report_type': 'financial', 'export_format': 'csv'})
+
+        output = io.BytesIO()
+        self.analytics.with_user(manager)._write_export(output)
+        rows = list(csv.reader(io.StringIO(output.getvalue().decode('utf-8'))))
+        self.assertIn('consultation', [row[5] for row in rows[1:]])
+        self.assertNotIn('lab', [row[5] for row in rows[1:]])
+
+    def test_background_report_cached_for_closed_period(self):
+        """Test that a closed period is computed once and then served from cache"""
+        Job = self.env['hospital.report.job']
+        date_from = Date.today() - relativedelta(months=2)
+        date_to = Date.today() - relativedelta(months=1)
+        self._create_bill([('consultation', 90.0)], state='paid', payment_method='cash').date_bill = date_to
+
+        job = Job.request_report('financial', date_from, date_to)
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(Job.request_report('financial', date_from, date_to), job)
+
+        Job._cron_process_jobs()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.result['total_revenue'], 90.0)
+        self.assertEqual(Job.request_report('financial', date_from, date_to), job)
+
+    def test_interrupted_report_job_requeued(self):
+        """Test that a job left running by a killed worker is computed again"""
+        Job = self.env['hospital.report.job']
+        job = Job.request_report('financial', Date.today() - relativedelta(days=10), Date.today())
+        job.write({'state': 'running', 'date_started': Datetime.now() - relativedelta(hours=2)})
+        self.assertTrue(job.is_stuck)
+
+        Job._cron_process_jobs()
+        self.assertEqual(job.state, 'done')
+        self.assertTrue(job.date_started)
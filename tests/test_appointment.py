@@ -0,0 +1,124 @@
+from psycopg2 import IntegrityError
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+from odoo.tools import mute_logger
+from odoo.fields import Datetime
+from dateutil.relativedelta import relativedelta
+
+class TestHospitalAppointment(TransactionCase):
+
+    def setUp(self):
+        super(TestHospitalAppointment, self).setUp()
+        self.appointment_model = self.env['hospital.appointment']
+        self.patient = self.env['hospital.patient'].create({
+            'name': 'Booking Patient',
+            'gender': 'male',
+            'email': 'booking.patient@example.com',
+        })
+        self.doctor = self.env['hospital.doctor'].create({'name': 'Dr. Booking'})
+        self.start = Datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + relativedelta(days=1)
+
+    def _book(self, start, duration=1.0, doctor=None):
+        return self.appointment_model.create({
+            'patient_id': self.patient.id,
+            'doctor_id': (doctor or self.doctor).id,
+            'date_appointment': start,
+            'duration': duration,
+        })
+
+    def _overlap_error(self):
+        """Genuine overlaps are refused by the exclusion constraint when btree_gist is available"""
+        self.env.cr.execute("SELECT 1 FROM pg_constraint WHERE conname = 'hospital_appointment_doctor_no_overlap'")
+        return IntegrityError if self.env.cr.rowcount else ValidationError
+
+    def test_end_date_stored(self):
+        """Test that the end of the appointment is stored"""
+        appointment = self._book(self.start, duration=1.5)
+        self.assertEqual(appointment.date_end, self.start + relativedelta(minutes=90))
+
+    def test_overlap_rejected(self):
+        """Test that an overlapping booking of the same doctor is rejected"""
+        self._book(self.start, duration=2.0)
+        with self.assertRaises(self._overlap_error()), mute_logger('odoo.sql_db'):
+            self._book(self.start + relativedelta(hours=1))
+
+    def test_adjacent_and_cancelled_allowed(self):
+        """Test back-to-back bookings and re-booking a cancelled slot"""
+        first = self._book(self.start)
+        self._book(self.start + relativedelta(hours=1))
+        first.action_cancel()
+        self._book(self.start, duration=0.5)
+
+    def test_duration_bounded(self):
+        """Test that durations beyond the overlap window are refused"""
+        with self.assertRaises(ValidationError):
+            self._book(self.start, duration=25)
+
+    def test_batch_create_validates_within_batch(self):
+        """Test that overlapping bookings inside one batch are detected"""
+        with self.assertRaises(self._overlap_error()), mute_logger('odoo.sql_db'):
+            self.appointment_model.create([{
+                'patient_id': self.patient.id,
+                'doctor_id': self.doctor.id,
+                'date_appointment': self.start + relativedelta(minutes=offset),
+                'duration': 0.5,
+            } for offset in (0, 20)])
+
+    def test_batch_create_schedule(self):
+        """Test importing a day of back-to-back bookings for several doctors"""
+        other = self.env['hospital.doctor'].create({'name': 'Dr. Batch'})
+        self._book(self.start - relativedelta(hours=1))
+        appointments = self.appointment_model.create([{
+            'patient_id': self.patient.id,
+            'doctor_id': doctor.id,
+            'date_appointment': self.start + relativedelta(minutes=30 * slot),
+            'duration': 0.5,
+        } for doctor in (self.doctor, other) for slot in range(16)])
+        self.assertEqual(len(appointments), 32)
+        self.assertTrue(all(ref != 'New' for ref in appointments.mapped('reference')))
+
+    def test_free_slots(self):
+        """Test that free slots skip existing bookings"""
+        self.env.user.tz = 'UTC'
+        self._book(self.start)
+        day = self.start.date()
+        result = self.env['hospital.doctor'].get_free_slots(
+            day, day, slot_length=1.0, doctor_ids=self.doctor.ids,
+            work_start=8.0, work_end=12.0, include_weekends=True,
+        )
+        self.assertEqual(len(result), 1)
+        self.assertEqual([slot['start'][11:16] for slot in result[0]['slots']], ['08:00', '10:00', '11:00'])
+
+    def test_bulk_confirm_queues_emails(self):
+        """Test that bulk confirmation queues mails and only warns for missing emails"""
+        no_email = self.env['hospital.patient'].create({'name': 'No Email Patient', 'gender': 'female'})
+        with_email = self._book(self.start)
+        without_email = self._book(self.start + relativedelta(hours=2))
+        without_email.patient_id = no_email
+
+        (with_email | without_email).action_confirm()
+
+        self.assertEqual(set((with_email | without_email).mapped('state')), {'confirmed'})
+        mails = self.env['mail.mail'].search([('model', '=', 'hospital.appointment'), ('res_id', 'in', (with_email | without_email).ids)])
+        self.assertEqual(mails.mapped('res_id'), with_email.ids)
+        self.assertEqual(mails.state, 'outgoing')
+        self.assertTrue(mails.hospital_confirmation)
+        self.assertIn('has no email address', without_email.message_ids[0].body)
+
+    def test_retry_only_confirmation_emails(self):
+        """Test that the retry cron resends failed confirmations but not other appointment mails"""
+        appointment = self._book(self.start)
+        appointment.action_confirm()
+        confirmation = self.env['mail.mail'].search([('model', '=', 'hospital.appointment'), ('res_id', '=', appointment.id)])
+        reminder = self.env['mail.mail'].create({
+            'model': 'hospital.appointment',
+            'res_id': appointment.id,
+            'subject': 'Reminder',
+            'email_to': self.patient.email,
+        })
+        (confirmation | reminder).write({'state': 'exception', 'failure_type': 'mail_smtp'})
+
+        self.appointment_model._cron_retry_confirmation_emails()
+        self.assertEqual(confirmation.state, 'outgoing')
+        self.assertEqual(confirmation.hospital_retry_count, 1)
+        self.assertEqual(reminder.state, 'exception')
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from .common import HospitalDataGenerator
+from ..models.kpi_cache import kpi_cache
+
+_logger = logging.getLogger(__name__)
+
+# Run with: --test-tags hospital_benchmark
+# HOSPITAL_BENCHMARK_SIZES overrides the patient counts (comma separated),
+# HOSPITAL_BENCHMARK_OUTPUT writes the measurements to a JSON file.
+DEFAULT_SIZES = (100, 1000, 5000)
+
+
+@tagged('hospital_benchmark', 'post_install', '-at_install', '-standard')
+class TestHospitalBenchmark(TransactionCase):
+
+    def setUp(self):
+        super(TestHospitalBenchmark, self).setUp()
+        self.generator = HospitalDataGenerator(self.env, seed=2024, prefix='BENCH')
+        self.results = []
+
+    def _sizes(self):
+        sizes = os.environ.get('HOSPITAL_BENCHMARK_SIZES')
+        if sizes:
+            return [int(size) for size in sizes.split(',')]
+        return list(DEFAULT_SIZES)
+
+    def _measure(self, size, label, func):
+        """Run func once, recording wall time and SQL query count"""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        kpi_cache.invalidate()
+        queries_before = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        func()
+        self.env.flush_all()
+        elapsed = time.perf_counter() - start
+        queries = self.env.cr.sql_log_count - queries_before
+        self.results.append({'size': size, 'operation': label, 'seconds': round(elapsed, 4), 'queries': queries})
+        _logger.info("benchmark size=%-6s %-45s %9.4fs %7d queries", size, label, elapsed, queries)
+
+    def _benchmark_size(self, size):
+        Analytics = self.env['hospital.analytics']
+        today = fields.Date.today()
+        dashboard = self.env['hospital.dashboard'].create({})
+        analytics = Analytics.create({'date_from': today - timedelta(days=365), 'date_to': today})
+
+        self._measure(size, 'dashboard.statistics', lambda: dashboard.read(['total_patients', 'average_bill_amount']))
+        self._measure(size, 'dashboard.appointment_chart', dashboard.get_appointment_chart_data)
+        self._measure(size, 'dashboard.revenue_chart', dashboard.get_revenue_chart_data)
+        self._measure(size, 'dashboard.department_distribution', dashboard.get_department_patient_distribution)
+        self._measure(size, 'kpi_snapshot.update', self.env['hospital.kpi.snapshot']._update_snapshot)
+
+        self._measure(size, 'analytics.financial', analytics.generate_financial_report)
+        self._measure(size, 'analytics.operational', analytics.generate_operational_report)
+        self._measure(size, 'analytics.patient', analytics.generate_patient_analytics)
+        self._measure(size, 'analytics.doctor', analytics.generate_doctor_performance)
+
+        self._measure(size, 'appointment.create x20', lambda: self.generator.create_appointments(20, days_back=0))
+
+        admissions = self.env['hospital.admission']
+        free_beds = self.generator.beds.filtered(lambda b: b.state == 'free')[:10]
+        if free_beds:
+            admissions = admissions.create([{
+                'patient_id': patient.id,
+                'bed_id': bed.id,
+            } for patient, bed in zip(self.generator.patients, free_beds)])
+        self._measure(size, 'admission.admit x%s' % len(admissions), admissions.action_admit)
+        self._measure(size, 'admission.discharge x%s' % len(admissions), admissions.action_discharge)
+
+        Notification = self.env['hospital.notification']
+        self._measure(size, 'cron.appointment_reminders', Notification.send_appointment_reminders)
+        self._measure(size, 'cron.bill_reminders', Notification.send_bill_reminders)
+
+    def test_benchmark(self):
+        """Time dashboard, analytics, booking, admission and cron paths at growing data sizes"""
+        generated = 0
+        for size in sorted(self._sizes()):
+            start = time.perf_counter()
+            self.generator.generate(patients=size - generated)
+            generated = size
+            _logger.info("benchmark size=%-6s data generated in %.2fs", size, time.perf_counter() - start)
+            self._benchmark_size(size)
+
+        output = os.environ.get('HOSPITAL_BENCHMARK_OUTPUT')
+        if output:
+            with open(output, 'w') as f:
+                json.dump(self.results, f, indent=2)
+        self.assertTrue(self.results)
@@ -0,0 +1,195 @@
+from odoo.tests.common import TransactionCase
+from odoo.fields import Date, Datetime
+from dateutil.relativedelta import relativedelta
+import base64
+
+class TestHospitalBill(TransactionCase):
+
+    def setUp(self):
+        super(TestHospitalBill, self).setUp()
+        self.bill_model = self.env['hospital.bill']
+        self.patient = self.env['hospital.patient'].create({
+            'name': 'Billing Patient',
+            'gender': 'male',
+            'date_of_birth': Date.today() - relativedelta(years=50),
+        })
+        self.room = self.env['hospital.room'].create({'name': 'Billing Ward', 'room_type': 'private', 'daily_rate': 500.0})
+        self.bed = self.env['hospital.bed'].create({'name': 'Billing Bed', 'room_id': self.room.id})
+
+    def test_room_charges_idempotent(self):
+        """Test that nightly room charges bill each day once"""
+        today = Date.today()
+        admission = self.env['hospital.admission'].create({
+            'patient_id': self.patient.id,
+            'bed_id': self.bed.id,
+            'date_admission': Datetime.to_datetime(today - relativedelta(days=3)) + relativedelta(hours=14),
+        })
+        admission.action_admit()
+
+        lines = self.bill_model.generate_room_charges(today).filtered(lambda l: l.admission_id == admission)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(lines.bill_id), 1)
+        self.assertEqual(lines.bill_id.total_amount, 1500.0)
+        self.assertFalse(self.bill_model.generate_room_charges(today).filtered(lambda l: l.admission_id == admission))
+
+        lines |= self.bill_model.generate_room_charges(today + relativedelta(days=1)).filtered(lambda l: l.admission_id == admission)
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(len(lines.bill_id), 1)
+        self.assertEqual(lines.bill_id.total_amount, 2000.0)
+        self.assertEqual(sorted(lines.mapped('charge_date'))[-1], today)
+
+    def _create_bills(self, count):
+        return self.bill_model.create([{
+            'patient_id': self.patient.id,
+            'bill_line_ids': [(0, 0, {
+                'product_type': 'medicine',
+                'description': 'Medicine %s' % index,
+                'quantity': 2,
+                'unit_price': 10.0 * (index + 1),
+            }) for index in range(3)],
+        } for _i in range(count)])
+
+    def test_mass_line_write_recomputes_totals(self):
+        """Test that a mass write on lines updates the totals of every bill"""
+        bills = self._create_bills(3)
+        self.assertEqual(bills.mapped('total_amount'), [120.0] * 3)
+        bills.bill_line_ids.write({'unit_price': 5.0})
+        self.assertEqual(bills.mapped('total_amount'), [30.0] * 3)
+        self.assertEqual(bills.mapped('patient_payable'), [30.0] * 3)
+
+    def test_recompute_all_amounts(self):
+        """Test the repair command on amounts corrupted behind the ORM"""
+        bills = self._create_bills(3)
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE hospital_bill SET subtotal = 0, total_amount = 0, amount = 0, patient_payable = 0 WHERE id IN %s", [tuple(bills.ids)])
+        self.env.cr.execute("UPDATE hospital_bill_line SET subtotal = 0 WHERE bill_id IN %s", [tuple(bills.ids)])
+        self.env.invalidate_all()
+
+        self.assertGreaterEqual(self.bill_model.recompute_all_amounts(batch_size=2), 3)
+        self.assertEqual(bills.mapped('total_amount'), [120.0] * 3)
+        self.assertEqual(bills.mapped('patient_payable'), [120.0] * 3)
+        self.assertEqual(sum(bills.bill_line_ids.mapped('subtotal')), 360.0)
+
+    def test_receivables_aging(self):
+        """Test the aging buckets of unpaid bills"""
+        today = Date.today()
+        bills = self._create_bills(4)
+        for bill, days in zip(bills, (-5, 10, 45, 120)):
+            bill.due_date = today - relativedelta(days=days)
+        bills[3].payment_method = 'cash'
+        paid = self._create_bills(1)
+        paid.due_date = today - relativedelta(days=200)
+        paid.action_paid()
+        self.env.flush_all()
+
+        aging = self.env['hospital.bill.aging'].search([('patient_id', '=', self.patient.id)])
+        self.assertEqual(aging.bill_id, bills)
+        self.assertEqual({row.bill_id: row.aging_bucket for row in aging}, dict(zip(bills, ['not_due', '0_30', '31_60', '90_plus'])))
+
+        [summary] = [row for row in self.env['hospital.bill.aging'].get_aging_summary('patient_id') if row['key'] == self.patient.id]
+        self.assertEqual(summary['amount_due'], 480.0)
+        self.assertEqual(summary['amount_90_plus'], 120.0)
+        self.assertEqual(summary['amount_61_90'], 0.0)
+
+    def _import_statement(self, filename, content):
+        wizard = self.env['hospital.bank.statement.import'].create({
+            'filename': filename,
+            'statement_file': base64.b64encode(content.encode()),
+        })
+        wizard.action_import()
+        return wizard
+
+    def test_bank_statement_csv(self):
+        """Test matching CSV statement lines by reference and amount"""
+        bills = self._create_bills(3)
+        content = 'Date,Communication,Amount\n' + '\n'.join([
+            '2024-01-05,Payment %s thank you,120.00' % bills[0].reference,
+            '2024-01-05,%s,99.00' % bills[1].reference,
+            '2024-01-06,UNKNOWN-REF,10.00',
+            '2024-01-06,%s,120.00' % bills[0].reference,
+        ])
+        wizard = self._import_statement('statement.csv', content)
+
+        self.assertEqual((wizard.line_count, wizard.matched_count, wizard.unmatched_count), (4, 1, 3))
+        self.assertEqual(bills[0].state, 'paid')
+        self.assertEqual(bills[0].payment_method, 'bank_transfer')
+        self.assertEqual(bills[1:].mapped('state'), ['draft', 'draft'])
+        unmatched = base64.b64decode(wizard.unmatched_file).decode()
+        self.assertIn('UNKNOWN-REF', unmatched)
+        self.assertIn('Amount does not match', unmatched)
+
+    def test_bank_statement_amount_separators(self):
+        """Test statement amounts written with thousands separators or decimal commas"""
+        bills = self.bill_model.create([{
+            'patient_id': self.patient.id,
+            'bill_line_ids': [(0, 0, {'product_type': 'procedure', 'description': 'Surgery', 'quantity': 1, 'unit_price': price})],
+        } for price in (1234.56, 1234.56, 80.5)])
+        content = 'Reference,Amount\n' + '\n'.join([
+            '%s,"1,234.56"' % bills[0].reference,
+            '%s,"1.234,56"' % bills[1].reference,
+            '%s,"80,50"' % bills[2].reference,
+        ])
+        wizard = self._import_statement('statement.csv', content)
+
+        self.assertEqual((wizard.matched_count, wizard.unmatched_count), (3, 0))
+        self.assertEqual(set(bills.mapped('state')), {'paid'})
+
+    def test_bank_statement_camt(self):
+        """Test matching the credit entries of a CAMT.053 statement"""
+        bills = self._create_bills(2)
+        entries = ''.join("""
+            <Ntry>
+                <Amt Ccy="MAD">%s</Amt>
+                <CdtDbtInd>%s</CdtDbtInd>
+                <NtryDtls><TxDtls><RmtInf><Ustrd>%s</Ustrd></RmtInf></TxDtls></NtryDtls>
+            </Ntry>""" % (amount, indicator, reference) for amount, indicator, reference in [
+            ('120.00', 'CRDT', bills[0].reference),
+            ('120.00', 'DBIT', bills[1].reference),
+        ])
+        content = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>%s</Stmt></BkToCstmrStmt></Document>""" % entries
+        wizard = self._import_statement('statement.xml', content)
+
+        self.assertEqual((wizard.line_count, wizard.matched_count, wizard.unmatched_count), (1, 1, 0))
+        self.assertEqual(bills.mapped('state'), ['paid', 'draft'])
+
+    def test_bank_statement_entities_not_expanded(self):
+        """Test that entities declared in an uploaded statement are not resolved"""
+        bill = self._create_bills(1)
+        content = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE Document [<!ENTITY billref "%s">]>
+<Document><BkToCstmrStmt><Stmt><Ntry><Amt>120.00</Amt><CdtDbtInd>CRDT</CdtDbtInd>
+<NtryDtls><TxDtls><RmtInf><Ustrd>&billref;</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry></Stmt></BkToCstmrStmt></Document>""" % bill.reference
+        wizard = self._import_statement('statement.xml', content)
+
+        self.assertEqual(wizard.matched_count, 0)
+        self.assertEqual(bill.state, 'draft')
+
+    def test_insurance_policy_expiry(self):
+        """Test that the daily cron expires a policy and updates only its draft bills"""
+        provider = self.env['hospital.insurance.provider'].create({'name': 'Billing Insurer'})
+        policy = self.env['hospital.insurance'].create({
+            'policy_number': 'BILL-POL-001',
+            'patient_id': self.patient.id,
+            'provider_id': provider.id,
+            'coverage_percentage': 50.0,
+            'start_date': Date.today() - relativedelta(days=30),
+            'end_date': Date.today() + relativedelta(days=5),
+        })
+        draft, paid = self._create_bills(2)
+        (draft | paid).insurance_id = policy
+        paid.action_paid()
+        self.assertTrue(policy.is_active)
+        self.assertEqual(draft.patient_payable, 60.0)
+
+        # The policy ended yesterday, but nothing rewrote its dates since
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE hospital_insurance SET end_date = %s WHERE id = %s", [Date.today() - relativedelta(days=1), policy.id])
+        self.env.invalidate_all()
+        self.assertTrue(policy.is_active)
+
+        self.env['hospital.insurance']._cron_update_active_policies()
+        self.assertFalse(policy.is_active)
+        self.assertEqual(draft.insurance_coverage, 0.0)
+        self.assertEqual(draft.patient_payable, 120.0)
+        self.assertEqual(paid.patient_payable, 60.0)
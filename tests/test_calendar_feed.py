@@ -0,0 +1,39 @@
+from odoo.tests.common import TransactionCase
+from odoo.fields import Datetime
+from dateutil.relativedelta import relativedelta
+
+class TestDoctorCalendarFeed(TransactionCase):
+
+    def setUp(self):
+        super(TestDoctorCalendarFeed, self).setUp()
+        self.doctor = self.env['hospital.doctor'].create({'name': 'Dr. Calendar'})
+        self.doctor.action_generate_calendar_token()
+        self.patient = self.env['hospital.patient'].create({'name': 'Calendar Patient', 'gender': 'male'})
+        self.appointment = self.env['hospital.appointment'].create({
+            'patient_id': self.patient.id,
+            'doctor_id': self.doctor.id,
+            'date_appointment': Datetime.now() + relativedelta(days=1),
+        })
+
+    def test_feed_content(self):
+        """Test the rendered events of the feed"""
+        feed = self.doctor._render_calendar_feed()
+        self.assertTrue(feed.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn('UID:appointment-%s@' % self.appointment.id, feed)
+        self.assertIn('Calendar Patient', feed)
+        self.assertTrue(self.doctor.calendar_feed_url.endswith('/%s/appointments.ics' % self.doctor.calendar_token))
+
+    def test_etag_changes_with_appointments(self):
+        """Test that the ETag only changes when the doctor's appointments do"""
+        etag = self.doctor._get_calendar_feed_etag()
+        self.assertEqual(self.doctor._get_calendar_feed_etag(), etag)
+        self.appointment.action_cancel()
+        self.env.flush_all()
+        self.assertNotEqual(self.doctor._get_calendar_feed_etag(), etag)
+
+    def test_since_returns_delta(self):
+        """Test that since only returns recently modified appointments"""
+        future = Datetime.now() + relativedelta(days=2)
+        self.assertNotIn('BEGIN:VEVENT', self.doctor._render_calendar_feed(since=future))
+        past = Datetime.now() - relativedelta(days=1)
+        self.assertIn('BEGIN:VEVENT', self.doctor._render_calendar_feed(since=past))